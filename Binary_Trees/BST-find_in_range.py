@@ -3,17 +3,20 @@
 
 
 def between_vals(current, a, b):
-    out = []
-    if current is None:
-        return out
-
-    if not (a < current.item < b):
-        return out
-
-    if current.left is not None:
-        out = out + between_vals(current.left, a, b)
-
-    if current.right is not None:
-        out = out + between_vals(current.right.item, a, b)
-
-    return out
+    """
+    Lazily yield, in sorted order, every item strictly between a and b in the BST rooted at current.
+    Left subtrees of items no greater than a are never entered, and the walk ends at the first item no less than b,
+    so it takes O(height + matches) steps for the matches actually consumed.
+    """
+    stack = []
+    while stack or current is not None:
+        if current is not None:
+            stack.append(current)
+            current = current.left if a < current.item else None   # Everything on the left is <= a otherwise
+        else:
+            node = stack.pop()
+            if not node.item < b:
+                return  # Every item still to come is larger
+            if a < node.item:
+                yield node.item
+            current = node.right
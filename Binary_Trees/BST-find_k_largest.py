@@ -3,16 +3,22 @@
 
 
 def find_largest(current, k):
-    out = []
-
-    if current.left is not None:
-        out = out + find_largest(current.left)
-
-    out = out + current.item
-
-    if current.right is not None:
-        out = out + find_largest(current.right)
-
-    if current == self.root:
-        return out[-k]
-    return out
+    """
+    The k-th largest item (k=1 being the largest) in the BST rooted at current, found by walking it in reverse order
+    and stopping at the k-th item, so it takes O(height + k) steps. BinarySearchTree.kth_largest answers the same
+    query in O(height) from subtree sizes.
+    """
+    if k < 1:
+        raise IndexError("k should be at least 1")
+    stack = []
+    while stack or current is not None:
+        if current is not None:
+            stack.append(current)
+            current = current.right
+        else:
+            current = stack.pop()
+            k -= 1
+            if k == 0:
+                return current.item
+            current = current.left
+    raise IndexError("the tree has fewer than k items")
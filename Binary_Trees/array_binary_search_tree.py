@@ -0,0 +1,332 @@
+# Binary Search Tree Stored in Parallel Arrays
+
+from array import array
+
+NIL = 0     # Index of the sentinel node standing in for every missing child: height 0, size 0, its own children
+
+
+class ArrayBinarySearchTree:
+    """
+    BinarySearchTree with the same API, but with no node objects: node i's item, children, height and subtree size
+    live at index i of five typed arrays, and children are referred to by index. That comes to 36 bytes a node
+    (plus the arrays' growth slack) against a TreeNode's 72, with the item itself stored unboxed too.
+    Items must therefore be ints that fit in 64 bits. Deleted nodes' slots are chained into a free list, through
+    their left child index, and reused by later inserts.
+    """
+
+    def __init__(self, balanced=False):
+        """
+        Args:
+            balanced (bool): Keep the tree AVL balanced, rotating after each insert and delete, so sorted input
+                still gives a tree of O(log n) height rather than a linked list.
+        """
+        self.items = array('q', [0])
+        self.lefts = array('q', [NIL])
+        self.rights = array('q', [NIL])
+        self.heights = array('i', [0])
+        self.sizes = array('q', [0])
+        self.root = NIL
+        self.free = NIL     # First slot of the free list, or NIL if it is empty
+        self.count = 0
+        self.balanced = balanced
+
+    # -----------------------------------------------------------------------
+
+    def __len__(self):
+        return self.count
+
+    # -----------------------------------------------------------------------
+
+    def __iter__(self):
+        """
+        Every item in sorted order, by an in-order walk over an explicit stack.
+        """
+        items, lefts, rights = self.items, self.lefts, self.rights
+        stack = []
+        current = self.root
+        while stack or current != NIL:
+            if current != NIL:
+                stack.append(current)
+                current = lefts[current]
+            else:
+                current = stack.pop()
+                yield items[current]
+                current = rights[current]
+
+    # -----------------------------------------------------------------------
+
+    def __contains__(self, item):
+        items, lefts, rights = self.items, self.lefts, self.rights
+        current = self.root
+        while current != NIL:
+            if item == items[current]:
+                return True
+            current = lefts[current] if item < items[current] else rights[current]
+        return False
+
+    # -----------------------------------------------------------------------
+
+    def new_node(self, item):
+        """
+        Index of a fresh leaf holding item, reusing a slot from the free list if there is one.
+        The item is stored first, so one that doesn't fit in the array (TypeError, OverflowError) changes nothing.
+        """
+        index = self.free
+        if index == NIL:
+            index = len(self.items)
+            self.items.append(item)
+            self.lefts.append(NIL)
+            self.rights.append(NIL)
+            self.heights.append(1)
+            self.sizes.append(1)
+            return index
+        self.items[index] = item
+        self.free = self.lefts[index]
+        self.lefts[index] = NIL
+        self.rights[index] = NIL
+        self.heights[index] = 1
+        self.sizes[index] = 1
+        return index
+
+    # -----------------------------------------------------------------------
+
+    def free_node(self, index):
+        self.lefts[index] = self.free
+        self.rights[index] = NIL
+        self.free = index
+
+    # -----------------------------------------------------------------------
+
+    def insert(self, item):
+        """
+        Add item to the tree, unless it is already there.
+        Returns:
+            Whether item was added.
+        """
+        items, lefts, rights = self.items, self.lefts, self.rights
+        path = []
+        current = self.root
+        while current != NIL:
+            if item == items[current]:
+                return False
+            path.append(current)
+            current = lefts[current] if item < items[current] else rights[current]
+
+        node = self.new_node(item)
+        sizes = self.sizes
+        for ancestor in path:
+            sizes[ancestor] += 1
+        if not path:
+            self.root = node
+        elif item < items[path[-1]]:
+            lefts[path[-1]] = node
+        else:
+            rights[path[-1]] = node
+        self.count += 1
+        self.retrace(path)
+        return True
+
+    # -----------------------------------------------------------------------
+
+    def delete(self, item):
+        """
+        Remove item from the tree, raising KeyError if it isn't there.
+        """
+        items, lefts, rights = self.items, self.lefts, self.rights
+        path = []
+        current = self.root
+        while current != NIL and item != items[current]:
+            path.append(current)
+            current = lefts[current] if item < items[current] else rights[current]
+        if current == NIL:
+            raise KeyError(str(item)+" not found")
+
+        if lefts[current] != NIL and rights[current] != NIL:
+            # Two children: take over the item of the successor (the smallest in the right subtree), then remove
+            # the successor's node instead, which has no left child
+            path.append(current)
+            successor = rights[current]
+            while lefts[successor] != NIL:
+                path.append(successor)
+                successor = lefts[successor]
+            items[current] = items[successor]
+            current = successor
+
+        sizes = self.sizes
+        for ancestor in path:
+            sizes[ancestor] -= 1
+        child = lefts[current] if lefts[current] != NIL else rights[current]
+        if not path:
+            self.root = child
+        elif lefts[path[-1]] == current:
+            lefts[path[-1]] = child
+        else:
+            rights[path[-1]] = child
+        self.free_node(current)
+        self.count -= 1
+        self.retrace(path)
+
+    # -----------------------------------------------------------------------
+
+    def update_node(self, index):
+        """
+        Recompute node index's height and size from its children's.
+        """
+        left, right = self.lefts[index], self.rights[index]
+        self.heights[index] = max(self.heights[left], self.heights[right]) + 1
+        self.sizes[index] = self.sizes[left] + self.sizes[right] + 1
+
+    # -----------------------------------------------------------------------
+
+    def rotate_left(self, index):
+        """
+        Lift node index's right child into its place, returning the child as the new root of the subtree.
+        """
+        pivot = self.rights[index]
+        self.rights[index] = self.lefts[pivot]
+        self.lefts[pivot] = index
+        self.update_node(index)
+        self.update_node(pivot)
+        return pivot
+
+    # -----------------------------------------------------------------------
+
+    def rotate_right(self, index):
+        """
+        Lift node index's left child into its place, returning the child as the new root of the subtree.
+        """
+        pivot = self.lefts[index]
+        self.lefts[index] = self.rights[pivot]
+        self.rights[pivot] = index
+        self.update_node(index)
+        self.update_node(pivot)
+        return pivot
+
+    # -----------------------------------------------------------------------
+
+    def rebalance(self, index):
+        """
+        Restore the AVL property at node index, given its children already have it.
+        Returns the root of the subtree, which a rotation may have changed.
+        """
+        lefts, rights, heights = self.lefts, self.rights, self.heights
+        left, right = lefts[index], rights[index]
+        balance = heights[left] - heights[right]
+        if balance > 1:
+            if heights[lefts[left]] < heights[rights[left]]:
+                lefts[index] = self.rotate_left(left)
+            return self.rotate_right(index)
+        if balance < -1:
+            if heights[rights[right]] < heights[lefts[right]]:
+                rights[index] = self.rotate_right(right)
+            return self.rotate_left(index)
+        return index
+
+    # -----------------------------------------------------------------------
+
+    def retrace(self, path):
+        """
+        Update the heights of the nodes on path (root first) from the bottom up, rebalancing each in balanced mode.
+        Stops at the first node left as it was, since nothing above it can have changed either.
+        Sizes must already be up to date along path; rotations keep them so.
+        """
+        lefts, rights, heights = self.lefts, self.rights, self.heights
+        for position in range(len(path) - 1, -1, -1):
+            node = path[position]
+            old_height = heights[node]
+            heights[node] = max(heights[lefts[node]], heights[rights[node]]) + 1
+            subtree = self.rebalance(node) if self.balanced else node
+            if subtree == node:
+                if heights[node] == old_height:
+                    return
+            elif position == 0:
+                self.root = subtree
+            elif lefts[path[position - 1]] == node:
+                lefts[path[position - 1]] = subtree
+            else:
+                rights[path[position - 1]] = subtree
+
+    # -----------------------------------------------------------------------
+
+    def kth_smallest(self, k):
+        """
+        The k-th smallest item (k=1 being the smallest), found in O(height) by steering on subtree sizes.
+        """
+        if not 1 <= k <= self.count:
+            raise IndexError("k should be between 1 and the number of items ("+str(self.count)+")")
+        lefts, rights, sizes = self.lefts, self.rights, self.sizes
+        current = self.root
+        while True:
+            left_size = sizes[lefts[current]]
+            if k <= left_size:
+                current = lefts[current]
+            elif k == left_size + 1:
+                return self.items[current]
+            else:
+                k -= left_size + 1
+                current = rights[current]
+
+    # -----------------------------------------------------------------------
+
+    def kth_largest(self, k):
+        """
+        The k-th largest item (k=1 being the largest).
+        """
+        if not 1 <= k <= self.count:
+            raise IndexError("k should be between 1 and the number of items ("+str(self.count)+")")
+        return self.kth_smallest(self.count - k + 1)
+
+    # -----------------------------------------------------------------------
+
+    def rank(self, item):
+        """
+        The number of items in the tree smaller than item (whether or not item is in it), in O(height).
+        """
+        items, lefts, rights, sizes = self.items, self.lefts, self.rights, self.sizes
+        smaller = 0
+        current = self.root
+        while current != NIL:
+            if item < items[current]:
+                current = lefts[current]
+            elif item == items[current]:
+                return smaller + sizes[lefts[current]]
+            else:
+                smaller += sizes[lefts[current]] + 1
+                current = rights[current]
+        return smaller
+
+    # -----------------------------------------------------------------------
+
+    def count_in_range(self, a, b):
+        """
+        The number of items strictly between a and b, from two ranks rather than by visiting them.
+        """
+        if not a < b:
+            return 0
+        return self.rank(b) - self.rank(a) - (a in self)
+
+    # -----------------------------------------------------------------------
+
+    def find_min(self):
+        """
+        The smallest item in the tree, or None if it is empty.
+        """
+        current = self.root
+        if current == NIL:
+            return None
+        while self.lefts[current] != NIL:
+            current = self.lefts[current]
+        return self.items[current]
+
+    # -----------------------------------------------------------------------
+
+    def find_max(self):
+        """
+        The largest item in the tree, or None if it is empty.
+        """
+        current = self.root
+        if current == NIL:
+            return None
+        while self.rights[current] != NIL:
+            current = self.rights[current]
+        return self.items[current]
@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+# Benchmarks for package_statistics.py, run against a synthetic content index so no mirror is needed
+
+from argparse import ArgumentParser
+from random import Random
+from time import perf_counter
+
+from package_statistics import PackageCounter
+
+BLOCK_LINES = 100_000   # Lines generated up front and fed repeatedly, so generation cost stays out of the timings
+
+
+def synthetic_index_block(lines: int = BLOCK_LINES, packages: int = 60_000, seed: int = 0) -> bytes:
+    """Generate `lines` newline terminated records that look like a Debian content index.
+        Package popularity is skewed (like the real index), and roughly 1 in 50 records lists two packages.
+    """
+    rand = Random(seed)
+    names = [f"section/package-{i}" for i in range(packages)]
+    records = []
+    for i in range(lines):
+        package = names[int(packages * rand.random() ** 3)]
+        if i % 50 == 0:
+            package += "," + rand.choice(names)
+        records.append(f"usr/share/doc/{package.split('/')[1]}/file-{i}.txt{' ' * rand.randint(1, 40)}{package}\n")
+    return "".join(records).encode('utf-8')
+
+
+def time_counter(block: bytes, repeats: int, fast: bool) -> tuple[float, list[tuple[str, int]]]:
+    """Feed `block` into a PackageCounter `repeats` times, returning the elapsed time and the top 10 packages"""
+    counter = PackageCounter(fast)
+    start = perf_counter()
+    for _ in range(repeats):
+        counter.feed(block)
+    counter.close()
+    top = counter.most_common(10)
+    return perf_counter() - start, top
+
+
+def benchmark_parsers(total_lines: int) -> None:
+    """Compare the str tokenising parser against the bytes-native fast parser"""
+    block = synthetic_index_block()
+    repeats = max(1, total_lines // BLOCK_LINES)
+    lines = repeats * BLOCK_LINES
+    print(f"Counting a synthetic {lines:,} line index ({len(block) * repeats / 2**20:,.0f} MiB)")
+
+    parsed_time, parsed_top = time_counter(block, repeats, fast=False)
+    print(f"  parsed : {parsed_time:8.2f}s  {lines / parsed_time:>12,.0f} lines/s")
+    fast_time, fast_top = time_counter(block, repeats, fast=True)
+    print(f"  fast   : {fast_time:8.2f}s  {lines / fast_time:>12,.0f} lines/s  ({parsed_time / fast_time:.2f}x)")
+
+    if parsed_top != fast_top:
+        print("[!] Parsers disagree on the top 10 packages!")
+
+
+def parse_args():
+    parser = ArgumentParser(description="Benchmark content index counting on synthetic data")
+    parser.add_argument(
+        "-l", "--lines",
+        default=30_000_000,
+        type=int,
+        help="Number of index lines to count. Defaults to 30M, roughly the size of a large architecture's index."
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    benchmark_parsers(args.lines)
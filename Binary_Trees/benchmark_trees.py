@@ -0,0 +1,178 @@
+#!/usr/bin/python3
+# Benchmarks for the binary search trees: order statistics from subtree sizes against traversal
+
+from argparse import ArgumentParser
+from itertools import islice
+from pathlib import Path
+from random import Random
+from runpy import run_path
+from time import perf_counter
+import tracemalloc
+
+import binary_search_tree
+from binary_search_tree import BinarySearchTree
+from array_binary_search_tree import ArrayBinarySearchTree
+
+# The scripts' names aren't valid module names, so load their functions by path
+find_largest = run_path(str(Path(__file__).with_name("BST-find_k_largest.py")))["find_largest"]
+between_vals = run_path(str(Path(__file__).with_name("BST-find_in_range.py")))["between_vals"]
+
+
+def build_tree(size: int, seed: int = 0) -> tuple[BinarySearchTree, float]:
+    """Build a balanced tree of the integers 0 to size - 1 inserted in random order, returning it and the time taken"""
+    items = list(range(size))
+    Random(seed).shuffle(items)
+    tree = BinarySearchTree(balanced=True)
+    start = perf_counter()
+    for item in items:
+        tree.insert(item)
+    return tree, perf_counter() - start
+
+
+def inorder_items(node) -> list:
+    """Every item under node in sorted order, by a full iterative in-order traversal"""
+    items = []
+    stack = []
+    while stack or node is not None:
+        if node is not None:
+            stack.append(node)
+            node = node.left
+        else:
+            node = stack.pop()
+            items.append(node.item)
+            node = node.right
+    return items
+
+
+def time_per_call(function, *args, repeats: int) -> tuple[float, object]:
+    """Average seconds per call of function(*args) over `repeats` calls, along with its result"""
+    start = perf_counter()
+    for _ in range(repeats):
+        result = function(*args)
+    return (perf_counter() - start) / repeats, result
+
+
+def benchmark_kth_largest(tree: BinarySearchTree, query_seconds: float) -> None:
+    """Compare kth_largest against a reverse traversal stopping at k, and a full traversal, for a spread of k"""
+    size = len(tree)
+    traversal_time, items = time_per_call(inorder_items, tree.root, repeats=1)
+    print(f"  full in-order traversal: {traversal_time * 1e3:10.2f}ms, whatever k is")
+    for k in sorted({1, 10, 1_000, size // 100, size // 2, size}):
+        sized_time, sized = time_per_call(tree.kth_largest, k, repeats=10_000)
+        walks = max(1, int(query_seconds / max(time_per_call(find_largest, tree.root, k, repeats=1)[0], 1e-9)))
+        walk_time, walked = time_per_call(find_largest, tree.root, k, repeats=walks)
+        if not sized == walked == items[-k]:
+            print(f"[!] k={k}: kth_largest gave {sized}, find_largest {walked}, the traversal {items[-k]}")
+        print(f"  k = {k:>9,}: kth_largest {sized_time * 1e6:8.2f}us, find_largest {walk_time * 1e6:12.2f}us "
+              f"({walk_time / sized_time:,.1f}x)")
+
+
+def benchmark_rank(tree: BinarySearchTree, queries: int = 100_000) -> None:
+    """Time rank and kth_smallest over random queries"""
+    rand = Random(1)
+    probes = [rand.randrange(len(tree)) for _ in range(queries)]
+    start = perf_counter()
+    for item in probes:
+        tree.rank(item)
+    rank_time = perf_counter() - start
+    start = perf_counter()
+    for k in probes:
+        tree.kth_smallest(k + 1)
+    select_time = perf_counter() - start
+    print(f"  rank {rank_time / queries * 1e6:.2f}us, kth_smallest {select_time / queries * 1e6:.2f}us per query")
+
+
+def benchmark_range(tree: BinarySearchTree, first: int = 10) -> None:
+    """Compare streaming the first few matches of a range, and counting it, against materialising all of it"""
+    size = len(tree)
+    for a, b in ((-1, size), (size // 4, 3 * size // 4), (size // 2, size // 2 + 1_000)):
+        stream_time, streamed = time_per_call(lambda: list(islice(between_vals(tree.root, a, b), first)), repeats=1_000)
+        list_time, matches = time_per_call(lambda: list(between_vals(tree.root, a, b)), repeats=1)
+        count_time, count = time_per_call(tree.count_in_range, a, b, repeats=10_000)
+        if streamed != matches[:first] or count != len(matches):
+            print(f"[!] ({a}, {b}): streamed {streamed}, counted {count} of {len(matches)} matches")
+        print(f"  ({a:,}, {b:,}), {len(matches):,} matches: first {first} {stream_time * 1e6:.2f}us, "
+              f"all {list_time * 1e3:.2f}ms, count_in_range {count_time * 1e6:.2f}us")
+
+
+class DictTreeNode:
+    """TreeNode as it was before __slots__, with a __dict__ per node"""
+    def __init__(self, new_item=None, left=None, right=None):
+        self.item = new_item
+        self.left = left
+        self.right = right
+        self.height = 1
+        self.size = 1
+
+
+def build_traced(tree_class, items: list, node_class=None) -> tuple[object, int]:
+    """Build a balanced tree of items, returning it and the bytes it allocated (not counting the items themselves)"""
+    slots_node = binary_search_tree.TreeNode
+    if node_class is not None:
+        binary_search_tree.TreeNode = node_class
+    try:
+        tracemalloc.start()
+        tree = tree_class(balanced=True)
+        for item in items:
+            tree.insert(item)
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        binary_search_tree.TreeNode = slots_node
+    return tree, allocated
+
+
+def benchmark_storage(size: int, lookups: int = 200_000) -> None:
+    """Compare memory per node, in-order traversal and lookups across the node representations"""
+    rand = Random(2)
+    items = rand.sample(range(1 << 40), size)
+    probes = rand.sample(items, min(lookups, size))
+    print(f"Storing {size:,} random 40 bit keys in balanced trees")
+    for name, tree_class, node_class in (("TreeNode with __dict__", BinarySearchTree, DictTreeNode),
+                                         ("TreeNode with __slots__", BinarySearchTree, None),
+                                         ("ArrayBinarySearchTree", ArrayBinarySearchTree, None)):
+        tree, allocated = build_traced(tree_class, items, node_class)
+        traversal_time, ordered = time_per_call(list, tree, repeats=1)
+        start = perf_counter()
+        for item in probes:
+            item in tree
+        lookup_time = perf_counter() - start
+        if len(ordered) != size:
+            print(f"[!] {name} traversed {len(ordered):,} of {size:,} items")
+        print(f"  {name:<24} {allocated / size:6.1f} bytes/node  traversal {traversal_time / size * 1e9:6.1f}ns/node  "
+              f"lookup {lookup_time / len(probes) * 1e6:5.2f}us")
+        del tree, ordered
+
+
+def parse_args():
+    parser = ArgumentParser(description="Benchmark binary search tree order statistics")
+    parser.add_argument(
+        "-n", "--nodes",
+        default=1_000_000,
+        type=int,
+        help="Number of nodes in the tree. Defaults to 1M."
+    )
+    parser.add_argument(
+        "-q", "--query-seconds",
+        default=0.5,
+        type=float,
+        help="Roughly how long to spend timing each traversal query. Defaults to 0.5"
+    )
+    parser.add_argument(
+        "-s", "--storage-nodes",
+        default=1_000_000,
+        type=int,
+        help="Number of nodes in each tree compared for storage. Defaults to 1M."
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    tree, build_time = build_tree(args.nodes)
+    print(f"Built a balanced tree of {len(tree):,} nodes (height {tree.root.height}) in {build_time:.2f}s")
+    benchmark_kth_largest(tree, args.query_seconds)
+    benchmark_rank(tree)
+    benchmark_range(tree)
+    del tree
+    benchmark_storage(args.storage_nodes)
@@ -3,16 +3,289 @@
 
 
 class TreeNode:
+    __slots__ = ("item", "left", "right", "height", "size")    # No per-node __dict__, which would dwarf the fields
+
     def __init__(self, new_item=None, left=None, right=None):
         self.item = new_item
         self.left = left
         self.right = right
+        self.height = 1     # Levels in the subtree rooted here, counting this node
+        self.size = 1       # Nodes in the subtree rooted here, counting this one
+
+
+def node_height(node):
+    return 0 if node is None else node.height
+
+
+def node_size(node):
+    return 0 if node is None else node.size
+
+
+def update_node(node):
+    """
+    Recompute node's height and size from its children's.
+    """
+    node.height = max(node_height(node.left), node_height(node.right)) + 1
+    node.size = node_size(node.left) + node_size(node.right) + 1
+
+
+def rotate_left(node):
+    """
+    Lift node's right child into its place, returning the child as the new root of the subtree.
+    """
+    pivot = node.right
+    node.right = pivot.left
+    pivot.left = node
+    update_node(node)
+    update_node(pivot)
+    return pivot
+
+
+def rotate_right(node):
+    """
+    Lift node's left child into its place, returning the child as the new root of the subtree.
+    """
+    pivot = node.left
+    node.left = pivot.right
+    pivot.right = node
+    update_node(node)
+    update_node(pivot)
+    return pivot
+
+
+def rebalance(node):
+    """
+    Restore the AVL property at node (subtree heights differing by at most one), given its children already have it.
+    Returns the root of the subtree, which a rotation may have changed.
+    """
+    balance = node_height(node.left) - node_height(node.right)
+    if balance > 1:
+        if node_height(node.left.left) < node_height(node.left.right):
+            node.left = rotate_left(node.left)
+        return rotate_right(node)
+    if balance < -1:
+        if node_height(node.right.right) < node_height(node.right.left):
+            node.right = rotate_right(node.right)
+        return rotate_left(node)
+    return node
 
 
 class BinarySearchTree:
 
-    def __init__(self):
+    def __init__(self, balanced=False):
+        """
+        Args:
+            balanced (bool): Keep the tree AVL balanced, rotating after each insert and delete, so sorted input
+                still gives a tree of O(log n) height rather than a linked list.
+        """
         self.root = None
+        self.count = 0
+        self.balanced = balanced
+
+    # -----------------------------------------------------------------------
+
+    def __len__(self):
+        return self.count
+
+    # -----------------------------------------------------------------------
+
+    def __iter__(self):
+        """
+        Every item in sorted order, by an in-order walk over an explicit stack.
+        """
+        stack = []
+        current = self.root
+        while stack or current is not None:
+            if current is not None:
+                stack.append(current)
+                current = current.left
+            else:
+                current = stack.pop()
+                yield current.item
+                current = current.right
+
+    # -----------------------------------------------------------------------
+
+    def __contains__(self, item):
+        current = self.root
+        while current is not None:
+            if item == current.item:
+                return True
+            current = current.left if item < current.item else current.right
+        return False
+
+    # -----------------------------------------------------------------------
+
+    def insert(self, item):
+        """
+        Add item to the tree, unless it is already there.
+        Returns:
+            Whether item was added.
+        """
+        path = []
+        current = self.root
+        while current is not None:
+            if item == current.item:
+                return False
+            path.append(current)
+            current = current.left if item < current.item else current.right
+
+        for ancestor in path:
+            ancestor.size += 1
+        node = TreeNode(item)
+        if not path:
+            self.root = node
+        elif item < path[-1].item:
+            path[-1].left = node
+        else:
+            path[-1].right = node
+        self.count += 1
+        self.retrace(path)
+        return True
+
+    # -----------------------------------------------------------------------
+
+    def delete(self, item):
+        """
+        Remove item from the tree, raising KeyError if it isn't there.
+        """
+        path = []
+        current = self.root
+        while current is not None and item != current.item:
+            path.append(current)
+            current = current.left if item < current.item else current.right
+        if current is None:
+            raise KeyError(str(item)+" not found")
+
+        if current.left is not None and current.right is not None:
+            # Two children: take over the item of the successor (the smallest in the right subtree), then remove
+            # the successor's node instead, which has no left child
+            path.append(current)
+            successor = current.right
+            while successor.left is not None:
+                path.append(successor)
+                successor = successor.left
+            current.item = successor.item
+            current = successor
+
+        for ancestor in path:
+            ancestor.size -= 1
+        child = current.left if current.left is not None else current.right
+        if not path:
+            self.root = child
+        elif path[-1].left is current:
+            path[-1].left = child
+        else:
+            path[-1].right = child
+        self.count -= 1
+        self.retrace(path)
+
+    # -----------------------------------------------------------------------
+
+    def retrace(self, path):
+        """
+        Update the heights of the nodes on path (root first) from the bottom up, rebalancing each in balanced mode.
+        Stops at the first node left as it was, since nothing above it can have changed either.
+        Sizes must already be up to date along path; rotations keep them so.
+        """
+        for index in range(len(path) - 1, -1, -1):
+            node = path[index]
+            old_height = node.height
+            node.height = max(node_height(node.left), node_height(node.right)) + 1
+            subtree = rebalance(node) if self.balanced else node
+            if subtree is node:
+                if node.height == old_height:
+                    return
+            elif index == 0:
+                self.root = subtree
+            elif path[index - 1].left is node:
+                path[index - 1].left = subtree
+            else:
+                path[index - 1].right = subtree
+
+    # -----------------------------------------------------------------------
+
+    def kth_smallest(self, k):
+        """
+        The k-th smallest item (k=1 being the smallest), found in O(height) by steering on subtree sizes.
+        """
+        if not 1 <= k <= self.count:
+            raise IndexError("k should be between 1 and the number of items ("+str(self.count)+")")
+        current = self.root
+        while True:
+            left_size = node_size(current.left)
+            if k <= left_size:
+                current = current.left
+            elif k == left_size + 1:
+                return current.item
+            else:
+                k -= left_size + 1
+                current = current.right
+
+    # -----------------------------------------------------------------------
+
+    def kth_largest(self, k):
+        """
+        The k-th largest item (k=1 being the largest).
+        """
+        if not 1 <= k <= self.count:
+            raise IndexError("k should be between 1 and the number of items ("+str(self.count)+")")
+        return self.kth_smallest(self.count - k + 1)
+
+    # -----------------------------------------------------------------------
+
+    def rank(self, item):
+        """
+        The number of items in the tree smaller than item (whether or not item is in it), in O(height).
+        For an item in the tree, kth_smallest(rank(item) + 1) is that item.
+        """
+        smaller = 0
+        current = self.root
+        while current is not None:
+            if item < current.item:
+                current = current.left
+            elif item == current.item:
+                return smaller + node_size(current.left)
+            else:
+                smaller += node_size(current.left) + 1
+                current = current.right
+        return smaller
+
+    # -----------------------------------------------------------------------
+
+    def count_in_range(self, a, b):
+        """
+        The number of items strictly between a and b, from two ranks rather than by visiting them.
+        """
+        if not a < b:
+            return 0
+        return self.rank(b) - self.rank(a) - (a in self)
+
+    # -----------------------------------------------------------------------
+
+    def find_min(self):
+        """
+        The smallest item in the tree, or None if it is empty.
+        """
+        current = self.root
+        if current is None:
+            return None
+        while current.left is not None:
+            current = current.left
+        return current.item
+
+    # -----------------------------------------------------------------------
+
+    def find_max(self):
+        """
+        The largest item in the tree, or None if it is empty.
+        """
+        current = self.root
+        if current is None:
+            return None
+        while current.right is not None:
+            current = current.right
+        return current.item
 
     # -----------------------------------------------------------------------
 
@@ -1,67 +1,149 @@
 # MolarFox 2018
 # Binary Tree Class
 
+from collections import namedtuple
+
 
 class TreeNode:
+    __slots__ = ("item", "left", "right")  # No per-node __dict__, which would dwarf the fields
+
     def __init__(self, new_item=None, left=None, right=None):
         self.item = new_item
         self.left = left
         self.right = right
 
 
+# Everything the tree can tell you about one of its subtrees, all worked out in the same pass
+Aggregates = namedtuple("Aggregates", ["height", "total", "leaf_total", "count", "minimum", "maximum"])
+
+NO_AGGREGATES = Aggregates(0, 0, 0, 0, None, None)    # Those of an empty subtree
+
+
+def combine(item, left, right):
+    """
+    The aggregates of a node holding item, given those of its left and right subtrees.
+    """
+    if left.count == 0 and right.count == 0:
+        return Aggregates(1, item, item, 1, item, item)
+    minimum = maximum = item
+    for side in (left, right):
+        if side.count:
+            if side.minimum < minimum:
+                minimum = side.minimum
+            if side.maximum > maximum:
+                maximum = side.maximum
+    return Aggregates(max(left.height, right.height) + 1, left.total + right.total + item,
+                      left.leaf_total + right.leaf_total, left.count + right.count + 1, minimum, maximum)
+
+
 class BinaryTree:
 
-    def __init__(self):
-        self.root = None
+    def __init__(self, cache=False):
+        """
+        Args:
+            cache (bool): Keep the aggregates of every subtree once they have been worked out, so repeated queries
+                are O(1) until the tree changes. Changing it through root, set_left or set_right clears them;
+                after editing nodes directly, call invalidate().
+        """
+        self._root = None
+        self.version = 0    # Bumped on every change, so cached aggregates from an older version are discarded
+        self.cache = {} if cache else None
+        self.cache_version = 0
 
     # -----------------------------------------------------------------------
 
-    def get_height(self, node=0):
-        if node is None:
-            return 0
+    @property
+    def root(self):
+        return self._root
 
-        if type(node) is int:   # Doesn't seem to like self in arg declarations
-            node = self.root
+    @root.setter
+    def root(self, node):
+        self._root = node
+        self.invalidate()
 
-        if node.left is None or node.right is None:
-            if node.left is not None:
-                return self.get_height(node.left) + 1
-            if node.right is not None:
-                return self.get_height(node.right) + 1
-            return 1
+    # -----------------------------------------------------------------------
 
-        return max(self.get_height(node.left), self.get_height(node.right)) + 1
+    def set_left(self, parent, child):
+        parent.left = child
+        self.invalidate()
 
     # -----------------------------------------------------------------------
 
-    def sum_all(self, node=0):
-        if node is None:
-            return 0
+    def set_right(self, parent, child):
+        parent.right = child
+        self.invalidate()
+
+    # -----------------------------------------------------------------------
+
+    def invalidate(self):
+        self.version += 1
 
+    # -----------------------------------------------------------------------
+
+    def aggregates(self, node=0):
+        """
+        Height, sum, leaf sum, node count, and smallest and largest item of the subtree rooted at node (the whole tree
+        by default), found in a single post-order pass over an explicit stack, so any depth of tree works.
+        """
         if type(node) is int:   # Doesn't seem to like self in arg declarations
             node = self.root
+        if node is None:
+            return NO_AGGREGATES
+
+        if self.cache is not None:
+            if self.cache_version != self.version:
+                self.cache.clear()
+                self.cache_version = self.version
+            known = self.cache  # Subtrees worked out before are neither revisited nor forgotten
+            if node in known:
+                return known[node]
+        else:
+            known = {}          # Only holds subtrees whose parent is still on the stack
+
+        stack = [(node, False)]
+        while stack:
+            current, children_done = stack.pop()
+            if not children_done:
+                stack.append((current, True))
+                if current.right is not None and current.right not in known:
+                    stack.append((current.right, False))
+                if current.left is not None and current.left not in known:
+                    stack.append((current.left, False))
+                continue
+            left = NO_AGGREGATES if current.left is None else known[current.left]
+            right = NO_AGGREGATES if current.right is None else known[current.right]
+            if self.cache is None:
+                known.pop(current.left, None)
+                known.pop(current.right, None)
+            known[current] = combine(current.item, left, right)
+        return known[node]
+
+    # -----------------------------------------------------------------------
+
+    def get_height(self, node=0):
+        return self.aggregates(node).height
 
-        if node.left is None or node.right is None:
-            if node.left is not None:
-                return self.sum_leaves(node.left) + node.item
-            if node.right is not None:
-                return self.sum_leaves(node.right) + node.item
-            return node.item
+    # -----------------------------------------------------------------------
 
-        return self.sum_all(node.left) + self.sum_all(node.right) + node.item
+    def sum_all(self, node=0):
+        return self.aggregates(node).total
 
-        # -----------------------------------------------------------------------
+    # -----------------------------------------------------------------------
 
     def sum_leaves(self, node=0):
-        if node is None:
-            return 0
+        return self.aggregates(node).leaf_total
 
-        if type(node) is int:  # Doesn't seem to like self in arg declarations
-            node = self.root
+    # -----------------------------------------------------------------------
+
+    def count_nodes(self, node=0):
+        return self.aggregates(node).count
 
-        if node.left is None and node.right is None:
-            return node.item
+    # -----------------------------------------------------------------------
 
-        return self.get_height(node.left) + self.get_height(node.right)
+    def find_min(self, node=0):
+        return self.aggregates(node).minimum
 
+    # -----------------------------------------------------------------------
 
+    def find_max(self, node=0):
+        return self.aggregates(node).maximum
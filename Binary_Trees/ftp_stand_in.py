@@ -0,0 +1,209 @@
+# A minimal threaded FTP server holding an in-memory file tree, standing in for a Debian mirror in tests
+
+import socket
+from collections import Counter
+from threading import Thread
+from typing import Optional
+
+LIST_DATE = "Jan 01 00:00"
+
+
+class FTPStandIn:
+    """Serves `files` (absolute path -> contents) over FTP on an ephemeral port, in active (PORT/EPRT) and passive
+        (PASV/EPSV) mode, with REST, SIZE and MDTM. Every command received is recorded in `commands`, and the bytes
+        sent for each RETR in `bytes_sent`, so tests can check what a client actually asked for.
+
+    Failures can be staged: `drops` holds byte counts, and each RETR takes the next one, sends only that many bytes,
+        then closes the data connection and replies 426 as if the connection had dropped. `nlst=False` refuses NLST,
+        and `user_reply` sets the reply to USER (331 asks for a password, 230 logs straight in, 530 refuses).
+    """
+    def __init__(self, files: dict[str, bytes], host: str = "127.0.0.1", nlst: bool = True, user_reply: str = "331"):
+        self.files = dict(files)
+        self.mtimes = {path: "20230101000000" for path in files}
+        self.nlst = nlst
+        self.user_reply = user_reply
+        self.drops = []
+        self.commands = []
+        self.bytes_sent = Counter()
+        family = socket.AF_INET6 if ":" in host else socket.AF_INET
+        self._listener = socket.create_server((host, 0), family=family)
+        self.host = host
+        self.port = self._listener.getsockname()[1]
+        Thread(target=self._serve, daemon=True).start()
+
+    def __enter__(self) -> "FTPStandIn":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._listener.close()
+
+    def count(self, verb: str) -> int:
+        """Number of commands received with the given verb (e.g. "RETR")"""
+        return sum(command.split(" ")[0] == verb for command in self.commands)
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                control, _ = self._listener.accept()
+            except OSError:
+                return  # Closed
+            Thread(target=FTPSession(self, control).run, daemon=True).start()
+
+
+class FTPSession:
+    """One client's control connection to an FTPStandIn"""
+    def __init__(self, server: FTPStandIn, control: socket.socket):
+        self.server = server
+        self.control = control
+        self.cwd = "/"
+        self.rest = 0
+        self.passive = None     # Listener opened by PASV/EPSV, or None in active mode
+        self.active = None      # Address given by PORT/EPRT
+
+    def run(self) -> None:
+        with self.control, self.control.makefile('rb') as lines:
+            self.reply("220 Stand-in ready")
+            for line in lines:
+                command = line.decode('utf-8').rstrip("\r\n")
+                self.server.commands.append(command)
+                verb, _, arg = command.partition(" ")
+                handler = getattr(self, f"do_{verb.upper()}", None)
+                if handler is None:
+                    self.reply("502 Command not implemented")
+                elif handler(arg) is False:
+                    return
+
+    def reply(self, line: str) -> None:
+        self.control.sendall(f"{line}\r\n".encode('utf-8'))
+
+    def resolve(self, path: str) -> str:
+        if not path:
+            return self.cwd
+        if not path.startswith("/"):
+            path = f"{self.cwd.rstrip('/')}/{path}"
+        return path.rstrip("/") or "/"
+
+    def children(self, directory: str) -> Optional[list[str]]:
+        """Names directly inside `directory`, or None if there is no such directory"""
+        prefix = directory.rstrip("/") + "/"
+        names = {path[len(prefix):].split("/")[0] for path in self.server.files if path.startswith(prefix)}
+        return sorted(names) if names else None
+
+    def send_data(self, data: bytes, limit: Optional[int] = None) -> int:
+        """Open the data connection, send `data` (or its first `limit` bytes) and close it. Returns the bytes sent"""
+        self.reply("150 Opening data connection")
+        if self.passive is not None:
+            connection, _ = self.passive.accept()
+            self.passive.close()
+            self.passive = None
+        else:
+            connection = socket.create_connection(self.active)
+        with connection:
+            sent = data if limit is None else data[:limit]
+            connection.sendall(sent)
+        return len(sent)
+
+    def open_passive(self) -> int:
+        host = self.control.getsockname()[0]
+        self.passive = socket.create_server((host, 0), family=self.control.family)
+        return self.passive.getsockname()[1]
+
+    def do_USER(self, arg: str) -> None:
+        self.reply({"331": "331 Password required", "230": "230 Logged in"}.get(self.server.user_reply,
+                                                                                  f"{self.server.user_reply} Not allowed"))
+
+    def do_PASS(self, arg: str) -> None:
+        self.reply("230 Logged in")
+
+    def do_TYPE(self, arg: str) -> None:
+        self.reply("200 Type set")
+
+    def do_QUIT(self, arg: str) -> bool:
+        self.reply("221 Bye")
+        return False
+
+    def do_CWD(self, arg: str) -> None:
+        path = self.resolve(arg)
+        if self.children(path) is None:
+            self.reply("550 No such directory")
+            return
+        self.cwd = path
+        self.reply("250 Directory changed")
+
+    def do_PWD(self, arg: str) -> None:
+        self.reply(f'257 "{self.cwd}"')
+
+    def do_SIZE(self, arg: str) -> None:
+        path = self.resolve(arg)
+        if path not in self.server.files:
+            self.reply("550 No such file")
+            return
+        self.reply(f"213 {len(self.server.files[path])}")
+
+    def do_MDTM(self, arg: str) -> None:
+        path = self.resolve(arg)
+        if path not in self.server.files:
+            self.reply("550 No such file")
+            return
+        self.reply(f"213 {self.server.mtimes[path]}")
+
+    def do_PASV(self, arg: str) -> None:
+        port = self.open_passive()
+        host = self.control.getsockname()[0].replace(".", ",")
+        self.reply(f"227 Entering Passive Mode ({host},{port >> 8},{port & 0xFF})")
+
+    def do_EPSV(self, arg: str) -> None:
+        self.reply(f"229 Entering Extended Passive Mode (|||{self.open_passive()}|)")
+
+    def do_PORT(self, arg: str) -> None:
+        fields = arg.split(",")
+        self.active = (".".join(fields[:4]), int(fields[4]) << 8 | int(fields[5]))
+        self.reply("200 PORT command successful")
+
+    def do_EPRT(self, arg: str) -> None:
+        _, _, host, port, _ = arg.split(arg[0])
+        self.active = (host, int(port))
+        self.reply("200 EPRT command successful")
+
+    def do_REST(self, arg: str) -> None:
+        self.rest = int(arg)
+        self.reply(f"350 Restarting at {self.rest}")
+
+    def do_NLST(self, arg: str) -> None:
+        if not self.server.nlst:
+            self.reply("502 NLST not implemented")
+            return
+        names = self.children(self.resolve(arg)) or []
+        self.send_data("".join(f"{name}\r\n" for name in names).encode('utf-8'))
+        self.reply("226 Transfer complete")
+
+    def do_LIST(self, arg: str) -> None:
+        path = self.resolve(arg)
+        if path in self.server.files:
+            lines = [self.list_line(path.rsplit("/", 1)[1], path)]
+        else:
+            lines = [self.list_line(name, f"{path.rstrip('/')}/{name}") for name in self.children(path) or []]
+        self.send_data("".join(f"{line}\r\n" for line in lines).encode('utf-8'))
+        self.reply("226 Transfer complete")
+
+    def list_line(self, name: str, path: str) -> str:
+        if path in self.server.files:
+            return f"-rw-r--r--    1 ftp      ftp      {len(self.server.files[path]):>10} {LIST_DATE} {name}"
+        return f"drwxr-xr-x    2 ftp      ftp            4096 {LIST_DATE} {name}"
+
+    def do_RETR(self, arg: str) -> None:
+        path = self.resolve(arg)
+        rest, self.rest = self.rest, 0
+        if path not in self.server.files:
+            self.reply("550 No such file")
+            return
+        limit = self.server.drops.pop(0) if self.server.drops else None
+        sent = self.send_data(self.server.files[path][rest:], limit)
+        self.server.bytes_sent[path] += sent
+        if limit is not None and rest + sent < len(self.server.files[path]):
+            self.reply("426 Connection closed; transfer aborted")
+        else:
+            self.reply("226 Transfer complete")
@@ -19,16 +19,38 @@ from __future__ import annotations  # For annotating static class methods that r
 
 from argparse import ArgumentParser, BooleanOptionalAction
 
-import gzip
-from ftplib import FTP, all_errors
-from typing import Optional, Callable
+import asyncio
+import bisect
+import fcntl
+import json
+import mmap
+import os
+import socket
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from ftplib import FTP, all_errors, error_perm, error_reply, error_temp, parse227, parse229
+from itertools import repeat
+from queue import Empty, Full, Queue
+from tempfile import TemporaryDirectory
+from threading import Event, Lock, Thread, get_ident
+from typing import AsyncIterator, BinaryIO, Optional, Callable, Iterable, Iterator, Union
 from abc import ABC, abstractmethod, abstractproperty
 from collections import Counter
+from operator import itemgetter
+from array import array
 from dataclasses import dataclass
+from glob import glob
+from hashlib import sha256
 from io import BytesIO
 
 MIRROR = "ftp.uk.debian.org"
-REPO_PATH = "/debian/dists/stable/main/"
+DISTS_PATH = "/debian/dists/"
+REPO_PATH = f"{DISTS_PATH}stable/main/"
+READ_BLOCK_SIZE = 1 << 16   # Bytes requested per FTP data socket read when downloading
+SCAN_QUEUE_CHUNKS = 64      # Downloaded chunks a scan may buffer ahead of counting (~4MiB at READ_BLOCK_SIZE)
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "package_statistics")
 
 """A note on FTP modes and LIST cmd responses
 I had some trouble getting passive mode to work, even with all the NAT rules and port forwarding rules setup on my local network for it to work.
@@ -59,7 +81,7 @@ def extract_architectures(listing: list[str]) -> dict[str, str]:
         filename = filename.split('->')[0].strip()
 
         # Documentation guarantees contents index will always be *.gz compressed plaintext
-        arch_key = filename.lstrip("Contents-").rstrip(".gz")
+        arch_key = filename.removeprefix("Contents-").removesuffix(".gz")
         archs[arch_key] = filename
 
     return archs
@@ -147,12 +169,234 @@ class DirListing:
         return [x.filename for x in self]
 
 
+class GzipStreamDecoder:
+    """Incrementally gzip decompress a stream of bytes, passing each decompressed chunk on to `sink` as soon as it is available.
+        Only the decompressor window and the current chunk are held in memory, regardless of the size of the full file.
+    """
+    def __init__(self, sink: Callable[[bytes], None]):
+        self.sink = sink
+        self._decompressor = self._new_decompressor()
+        self._in_member = False
+
+    @staticmethod
+    def _new_decompressor():
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)  # +16 tells zlib to expect a gzip header and trailer
+
+    def write(self, chunk: bytes) -> None:
+        """Decompress the next chunk of the compressed stream"""
+        while chunk:
+            self._in_member = True
+            if data := self._decompressor.decompress(chunk):
+                self.sink(data)
+            if not self._decompressor.eof:
+                return
+
+            # A gzip file may contain several concatenated members - start a fresh decompressor for anything past this one
+            chunk = self._decompressor.unused_data
+            self._decompressor = self._new_decompressor()
+            self._in_member = False
+
+    def close(self) -> None:
+        """Signal the end of the compressed stream, raising EOFError if it was cut off part way through a gzip member"""
+        if self._in_member:
+            raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+
+
+def file_sha256(path: str) -> str:
+    digest = sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(READ_BLOCK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MirrorCache:
+    """A size-bounded, least-recently-used on-disk cache of files and directory listings downloaded from FTP mirrors.
+
+    Files are keyed by mirror and path, and stored alongside a validator describing the remote copy they were taken from
+        (see `Mirror.stat`). A cached file is only served while the remote validator still matches, so a mirror update
+        always triggers a fresh download. Listings have no reliable validator, so they are simply served for `listing_ttl`.
+    """
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = 512 << 20, listing_ttl: float = 3600):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.listing_ttl = listing_ttl
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, url: str, path: str) -> str:
+        return os.path.join(self.cache_dir, sha256(f"{url}:{path}".encode('utf-8')).hexdigest())
+
+    def _metadata(self, url: str, path: str, validator: Optional[str]) -> Optional[dict]:
+        """Return the metadata of the cached copy of `path` and mark it as used, if it matches `validator`"""
+        if validator is None:
+            return None
+
+        entry_path = self._entry_path(url, path)
+        try:
+            with open(f"{entry_path}.json") as f:
+                metadata = json.load(f)
+            if metadata["validator"] != validator:
+                return None
+            os.utime(entry_path)    # Mark as most recently used
+        except (OSError, ValueError, KeyError):
+            return None
+        return metadata
+
+    def lookup(self, url: str, path: str, validator: Optional[str]) -> Optional[str]:
+        """Return the local path of the cached copy of `path`, if one exists that was taken from the same remote version"""
+        if self._metadata(url, path, validator) is None:
+            return None
+        return self._entry_path(url, path)
+
+    def checksum(self, url: str, path: str, validator: Optional[str]) -> Optional[str]:
+        """Return the sha256 hex digest of the cached copy of `path`, if one exists that was taken from the same remote version"""
+        if (metadata := self._metadata(url, path, validator)) is None:
+            return None
+        return metadata.get("sha256")
+
+    def package_index_path(self, url: str, path: str, checksum: str) -> str:
+        """Path of the `PackageIndex` side file for the content index at `path`, when its compressed contents hash to `checksum`"""
+        return f"{self._entry_path(url, path)}-{checksum[:16]}.pkgidx"
+
+    def store_package_index(self, url: str, path: str, checksum: str, counter: PackageCounter) -> str:
+        """Persist the counts of a content index as a `PackageIndex`, replacing any built from older versions of the file"""
+        index_path = self.package_index_path(url, path, checksum)
+        for stale_path in glob(f"{self._entry_path(url, path)}-*.pkgidx"):
+            if stale_path != index_path:
+                os.remove(stale_path)
+
+        partial_path = f"{index_path}.{os.getpid()}.{get_ident()}.part"
+        PackageIndex.write(partial_path, counter)
+        os.replace(partial_path, index_path)
+        return index_path
+
+    @contextmanager
+    def store(self, url: str, path: str, validator: Optional[str]) -> Iterator[Optional[BinaryIO]]:
+        """Open a partial file to write a fresh copy of `path` into. It is only committed to the cache if the `with` block
+            completes without error, after which older entries are evicted to get back under `max_bytes`.
+            Yields None (and caches nothing) if the remote file has no validator to check it against later.
+
+        If the block fails, the partial file is kept. A later store of the same remote version reopens it for appending,
+            so the caller can resume the download from `f.tell()` rather than from byte 0. The shared partial file is
+            locked for the whole block, so a concurrent store of the same path (from another thread or run) instead
+            writes to a partial file of its own, starting from byte 0, which is discarded if that store fails.
+        """
+        if validator is None:
+            yield None
+            return
+
+        entry_path = self._entry_path(url, path)
+        partial_path = f"{entry_path}.part"
+        f = self._open_shared_partial(partial_path, validator)
+        shared = f is not None
+        if not shared:
+            partial_path = f"{entry_path}.{os.getpid()}.{get_ident()}.part"
+            f = open(partial_path, 'wb')
+
+        with f:
+            try:
+                yield f
+            except BaseException:
+                if not shared:
+                    os.remove(partial_path)
+                raise
+            f.flush()
+            try:
+                os.replace(partial_path, entry_path)
+            except FileNotFoundError:
+                return  # Deleted from under us, e.g. by the cache being cleared: nothing left to commit
+            if shared:
+                try:
+                    os.remove(f"{partial_path}.json")
+                except FileNotFoundError:
+                    pass
+
+        metadata_path = f"{entry_path}.json"
+        with open(f"{metadata_path}.{os.getpid()}.{get_ident()}.part", 'w') as f:
+            json.dump({"url": url, "path": path, "validator": validator, "sha256": file_sha256(entry_path)}, f)
+        os.replace(f.name, metadata_path)
+        self.evict()
+
+    @staticmethod
+    def _open_shared_partial(partial_path: str, validator: str) -> Optional[BinaryIO]:
+        """Open and exclusively lock the shared partial file at `partial_path`, positioned at its end if it holds the start
+            of the same remote version, and emptied otherwise. Returns None if another store holds the lock.
+        """
+        f = open(partial_path, 'ab')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # The holder of the lock may have committed the file (renaming it to the entry) between our open and flock
+            if os.fstat(f.fileno()).st_ino != os.stat(partial_path).st_ino:
+                raise BlockingIOError
+        except OSError:
+            f.close()
+            return None
+
+        try:
+            with open(f"{partial_path}.json") as metadata:
+                resumable = json.load(metadata)["validator"] == validator
+        except (OSError, ValueError, KeyError):
+            resumable = False
+        if not resumable:
+            f.truncate(0)
+            f.seek(0)
+            with open(f"{partial_path}.json", 'w') as metadata:
+                json.dump({"validator": validator}, metadata)
+        return f
+
+    def evict(self) -> None:
+        """Remove least recently used files until the cache fits within `max_bytes`"""
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if "." in filename:     # Sidecar metadata, listings, package indexes and partial downloads are not entries
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, filename))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filename))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, filename in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            entry_path = os.path.join(self.cache_dir, filename)
+            for evicted in (entry_path, f"{entry_path}.json", *glob(f"{entry_path}-*.pkgidx")):
+                try:
+                    os.remove(evicted)
+                except FileNotFoundError:
+                    pass
+            total -= size
+
+    def get_listing(self, url: str, path: str) -> Optional[list[str]]:
+        """Return the cached listing of `path`, if it was fetched less than `listing_ttl` seconds ago"""
+        try:
+            with open(f"{self._entry_path(url, path)}.listing.json") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - cached["fetched"] > self.listing_ttl:
+            return None
+        return cached["listing"]
+
+    def put_listing(self, url: str, path: str, listing: list[str]) -> None:
+        listing_path = f"{self._entry_path(url, path)}.listing.json"
+        with open(f"{listing_path}.{os.getpid()}.{get_ident()}.part", 'w') as f:
+            json.dump({"fetched": time.time(), "listing": listing}, f)
+        os.replace(f.name, listing_path)
+
+
 class Mirror:
-    def __init__(self, url: str):
-        self.ftp = FTP(url, user="anonymous")
+    def __init__(self, url: str, cache: Optional[MirrorCache] = None, retries: int = 5, retry_backoff: float = 1.0):
+        self.url = url
+        self.cache = cache
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.cwd = None
+        self.ftp = FTP()
         self.ftp.set_pasv(False)
-        self.ftp.connect()
-        self.ftp.login()
+        self.ftp.connect(url)
+        self.ftp.login()    # Anonymous login by default
 
     def set_debug_level(self, new_level: int) -> None:
         """Set FTP debug level"""
@@ -171,28 +415,139 @@ class Mirror:
         return self.ftp.passiveserver
 
     def connect(self) -> None:
-        """(Re-)initialise connection"""
+        """(Re-)initialise connection, returning to the last directory listed with `ls`"""
+        self.ftp.close()
         self.ftp.connect()
         self.ftp.login()
+        if self.cwd:
+            self.ftp.cwd(self.cwd)
 
-    def read(self, path: str, gzip_unzip: False) -> bytes:
+    def read(self, path: str, gzip_unzip: bool = False) -> bytes:
         """Download the file at the specified path into memory as raw bytes.
             Optionally gzip decompress the file (explicitly set via flag, not inferred from extension)
 
         Args:
             path (str): Path to desired file on target FTP server
-            gzip_unzip (False): Flag that attempts to gzip decompress the data before returning, if True
+            gzip_unzip (bool, optional): Flag that attempts to gzip decompress the data before returning, if True
 
         Returns:
             bytes: Raw bytes representing the contents of the target file, optionally gzip decompressed.
         """
         file_stream = BytesIO()
-        self.ftp.retrbinary(f'RETR {path}', file_stream.write)
-        file_stream.seek(0)     # Reset stream head ptr to start of stream
+        self.read_stream(path, file_stream.write, gzip_unzip)
+        return file_stream.getvalue()
+
+    def read_stream(
+        self, path: str, write: Callable[[bytes], None], gzip_unzip: bool = False, validator: Optional[str] = None
+    ) -> None:
+        """Download the file at the specified path, passing it to `write` one chunk at a time as it arrives off the wire.
+            Nothing is buffered beyond the current chunk, so the consumer can process the file while it is still downloading.
+            If the mirror has a cache holding a copy that matches the remote's current `stat`, that copy is streamed from
+            disk instead and nothing is transferred.
 
+        Args:
+            path (str): Path to desired file on target FTP server
+            write (Callable[[bytes], None]): Called with each chunk of the file, in order
+            gzip_unzip (bool, optional): Flag that gzip decompresses each chunk before it is passed to `write`, if True
+            validator (Optional[str], optional): The file's current `stat`, if the caller already has it. Fetched if None
+        """
+        decoder = None
         if gzip_unzip:
-            return gzip.decompress(file_stream.read())
-        return file_stream.getvalue()
+            decoder = GzipStreamDecoder(write)
+            write = decoder.write
+
+        if self.cache is None:
+            self._retr_resumable(path, write)
+        else:
+            self._read_stream_cached(path, write, validator or self.stat(path))
+
+        if decoder:
+            decoder.close()
+
+    def _read_stream_cached(self, path: str, write: Callable[[bytes], None], validator: Optional[str]) -> None:
+        if cached_path := self.cache.lookup(self.url, path, validator):
+            with open(cached_path, 'rb') as f:
+                while chunk := f.read(READ_BLOCK_SIZE):
+                    write(chunk)
+            return
+
+        with self.cache.store(self.url, path, validator) as cache_file:
+            if cache_file is None:
+                self._retr_resumable(path, write)
+                return
+
+            # Replay whatever an earlier, interrupted download of this version left behind, then fetch only the rest
+            if resume_from := cache_file.tell():
+                with open(cache_file.name, 'rb') as partial:
+                    while chunk := partial.read(min(READ_BLOCK_SIZE, resume_from - partial.tell())):
+                        write(chunk)
+
+            def tee(chunk: bytes) -> None:
+                cache_file.write(chunk)
+                write(chunk)
+            self._retr_resumable(path, tee, resume_from)
+
+    def _retr_resumable(self, path: str, write: Callable[[bytes], None], offset: int = 0) -> None:
+        """RETR the file at `path` starting from byte `offset`, passing it to `write` chunk by chunk.
+            If the transfer fails, reconnect and continue with REST from the last byte received, backing off
+            exponentially between attempts. Gives up and re-raises after `self.retries` consecutive failed attempts,
+            or straight away on a permanent (5xx) error.
+        """
+        received = offset
+
+        def counted_write(chunk: bytes) -> None:
+            nonlocal received
+            write(chunk)
+            received += len(chunk)
+
+        attempt = 0
+        while True:
+            progress = received
+            try:
+                if attempt:
+                    self.connect()
+                self.ftp.retrbinary(f'RETR {path}', counted_write, blocksize=READ_BLOCK_SIZE, rest=received or None)
+                return
+            except error_perm:
+                raise   # e.g. no such file - retrying won't help
+            except all_errors as e:
+                attempt = 1 if received > progress else attempt + 1     # Only consecutive attempts without progress count
+                if attempt > self.retries:
+                    raise
+                delay = min(self.retry_backoff * 2 ** (attempt - 1), 30)
+                print(f"[!] Transfer of {path} interrupted after {received} bytes. Resuming in {delay:.0f}s...\n    Error detail: {e}\n")
+                time.sleep(delay)
+
+    def cached_checksum(self, path: str, validator: Optional[str] = None) -> Optional[str]:
+        """Get the sha256 hex digest of the file at `path`, if the cache holds a copy of its current version.
+            `validator` is the file's current `stat`, if the caller already has it.
+        """
+        if self.cache is None:
+            return None
+        return self.cache.checksum(self.url, path, validator or self.stat(path))
+
+    def stat(self, path: str) -> Optional[str]:
+        """Get a validator for the remote file at `path`, that changes whenever the file does.
+            Prefers the SIZE and MDTM commands, falling back to the size and modification time of a LIST response.
+
+        Returns:
+            Optional[str]: A string of form "<size>:<modification time>", or None if the server provides neither
+        """
+        try:
+            self.ftp.voidcmd("TYPE I")  # SIZE is only well defined for binary transfers
+            size = self.ftp.size(path)
+            mod_time = self.ftp.voidcmd(f"MDTM {path}").split()[-1]
+            return f"{size}:{mod_time}"
+        except all_errors:
+            pass
+
+        try:
+            entries = self._ls_dir_(path).entries
+        except (*all_errors, IndexError):
+            return None
+        if len(entries) != 1:
+            return None
+        return f"{entries[0].size_bytes}:{' '.join(entries[0].mod_time)}"
 
     def ls(self, path: Optional[str] = None) -> list[str]:
         """Get list of files and dirs at `path`. Uses current working dir if no path specified
@@ -205,7 +560,16 @@ class Mirror:
         """
         if path:
             self.ftp.cwd(path)
+            self.cwd = path
+            if self.cache and (listing := self.cache.get_listing(self.url, path)) is not None:
+                return listing
 
+        listing = self._ls_uncached()
+        if self.cache and path and listing:
+            self.cache.put_listing(self.url, path, listing)
+        return listing
+
+    def _ls_uncached(self) -> list[str]:
         # Try nlst, then fallback to dir
         try:
             return self._ls_nlst_()
@@ -221,14 +585,14 @@ class Mirror:
             )
         return []
 
-    def _ls_dir_(self) -> DirListing:
+    def _ls_dir_(self, path: Optional[str] = None) -> DirListing:
         """Retrieve directory listing using `dir`. This invisibly calls LIST and just returns the server resp (see note above)"""
         def ftp_curry(cache: list) -> Callable[[any], list[any]]:
             return lambda x: cache.append(x)
 
         dir_lines = []
         ftp_acc = ftp_curry(dir_lines)
-        self.ftp.dir(ftp_acc)
+        self.ftp.dir(*([path] if path else []), ftp_acc)
 
         return DirListing.parse_list_lines(
             dir_lines,
@@ -240,33 +604,841 @@ class Mirror:
         return self.ftp.nlst()
 
 
-def top_n_packages_by_files(index_data: Union[bytes, str], n: int = 10) -> list[tuple[str, int]]:
+class PackageIndex:
+    """A compact, pre-aggregated package -> file count table for one content index, memory-mapped from a side file so
+        that top n and per-package queries can be answered without touching (or even downloading) the index again.
+        Answers the same queries as a PackageCounter, and in the same order.
+
+    File layout, as native-endian 64 bit ints unless noted:
+        magic (8 bytes) | package count N | name blob length
+        counts[N]           in most_common order
+        name_offsets[N+1]   start of each package's name in the name blob, in most_common order
+        by_name[N]          positions in most_common order, sorted by package name (for binary search)
+        name blob           utf-8 package names, concatenated
+
+    Holds the file open (and mapped) until closed, so use via `with`.
+    """
+    exact = True
+
+    MAGIC = b"PKGIDX01"
+    INT_SIZE = array('q').itemsize
+    HEADER = len(MAGIC) + 2 * INT_SIZE
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._data[:len(self.MAGIC)] != self.MAGIC:
+            self._data.close()
+            raise ValueError(f"{path} is not a package index")
+
+        self.package_total = n = array('q', self._data[len(self.MAGIC):self.HEADER])[0]
+        self._ints = memoryview(self._data)[self.HEADER:self.HEADER + (3 * n + 1) * self.INT_SIZE].cast('q')
+        self._counts = self._ints[:n]
+        self._name_offsets = self._ints[n:2 * n + 1]
+        self._by_name = self._ints[2 * n + 1:]
+        self._names_start = self.HEADER + self._ints.nbytes
+
+    @classmethod
+    def write(cls, path: str, counter: PackageCounter) -> None:
+        """Write the counts held by `counter` to a new package index file at `path`"""
+        ranked = counter.most_common()
+        names = [p.encode('utf-8') for p, _ in ranked]
+        name_offsets = array('q', [0])
+        for name in names:
+            name_offsets.append(name_offsets[-1] + len(name))
+
+        with open(path, 'wb') as f:
+            f.write(cls.MAGIC)
+            f.write(array('q', [len(ranked), name_offsets[-1]]).tobytes())
+            f.write(array('q', [count for _, count in ranked]).tobytes())
+            f.write(name_offsets.tobytes())
+            f.write(array('q', sorted(range(len(names)), key=names.__getitem__)).tobytes())
+            f.write(b"".join(names))
+
+    def _name(self, i: int) -> bytes:
+        return self._data[self._names_start + self._name_offsets[i]:self._names_start + self._name_offsets[i + 1]]
+
+    def most_common(self, n: Optional[int] = None) -> list[tuple[str, int]]:
+        n = self.package_total if n is None else min(n, self.package_total)
+        return [(self._name(i).decode('utf-8'), self._counts[i]) for i in range(n)]
+
+    def count_of(self, package: str) -> int:
+        """Number of files associated with `package` (0 if it doesn't appear in the index), by binary search on name"""
+        name = package.encode('utf-8')
+        by_name = self._by_name
+        pos = bisect.bisect_left(range(self.package_total), name, key=lambda j: self._name(by_name[j]))
+        if pos < self.package_total and self._name(by_name[pos]) == name:
+            return self._counts[by_name[pos]]
+        return 0
+
+    def error_of(self, package: str) -> int:
+        return 0
+
+    def close(self) -> None:
+        for view in (self._counts, self._name_offsets, self._by_name, self._ints):
+            view.release()
+        self._data.close()
+
+    def __enter__(self) -> PackageIndex:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class AsyncMirror:
+    """An asyncio counterpart to Mirror, speaking FTP over asyncio streams rather than through the blocking ftplib.FTP.
+        Every connection (control and data) is just a pair of streams on the event loop, so one loop can drive many
+        listings and transfers at once - across several mirrors, suites or architectures - with no thread per connection.
+
+    Behaves the same as Mirror: active mode by default, nlst falling back to LIST, REST resumption of interrupted
+        downloads, and ftplib's exception types (so `all_errors` still catches everything). Use via `async with`.
+    """
+    def __init__(self, url: str, port: Optional[int] = None, retries: int = 5, retry_backoff: float = 1.0):
+        self.url = url
+        self.port = port or FTP.port
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.passive_mode = False
+        self.debug_level = 0
+        self.cwd = None
+        self._reader = None
+        self._writer = None
+
+    async def __aenter__(self) -> AsyncMirror:
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def set_debug_level(self, new_level: int) -> None:
+        """Set FTP debug level"""
+        self.debug_level = new_level
+
+    def get_debug_level(self) -> int:
+        """Get FTP debug level"""
+        return self.debug_level
+
+    def set_passive_mode(self, state: bool) -> None:
+        """Set passive mode state"""
+        self.passive_mode = state
+
+    def get_passive_mode(self) -> bool:
+        """Get passive mode state"""
+        return self.passive_mode
+
+    async def connect(self) -> None:
+        """(Re-)initialise connection, returning to the last directory listed with `ls`"""
+        await self.close()
+        self._reader, self._writer = await asyncio.open_connection(self.url, self.port)
+        self._expect(await self._read_response(), "2")     # Welcome message
+        resp = await self._command("USER anonymous")
+        if resp[0] == "3":
+            self._expect(await self._command("PASS anonymous@"), "2")
+        else:
+            self._expect(resp, "2")    # Logged straight in, or refused
+        if self.cwd:
+            self._expect(await self._command(f"CWD {self.cwd}"), "2")
+
+    async def close(self) -> None:
+        if self._writer is None:
+            return
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except all_errors:
+            pass
+        self._reader = self._writer = None
+
+    async def read(self, path: str, gzip_unzip: bool = False) -> bytes:
+        """Download the file at the specified path into memory as raw bytes (see `Mirror.read`)"""
+        file_stream = BytesIO()
+        await self.read_stream(path, file_stream.write, gzip_unzip)
+        return file_stream.getvalue()
+
+    async def read_stream(self, path: str, write: Callable[[bytes], None], gzip_unzip: bool = False) -> None:
+        """Download the file at the specified path, passing it to `write` one chunk at a time as it arrives
+            (see `Mirror.read_stream`). An interrupted transfer is resumed with REST, as in `Mirror._retr_resumable`.
+        """
+        decoder = None
+        if gzip_unzip:
+            decoder = GzipStreamDecoder(write)
+            write = decoder.write
+
+        received = 0
+        attempt = 0
+        while True:
+            progress = received
+            try:
+                if attempt:
+                    await self.connect()
+                self._expect(await self._command("TYPE I"), "2")
+                async for chunk in self._transfer(f"RETR {path}", received or None):
+                    write(chunk)
+                    received += len(chunk)
+                break
+            except error_perm:
+                raise   # e.g. no such file - retrying won't help
+            except all_errors as e:
+                attempt = 1 if received > progress else attempt + 1     # Only consecutive attempts without progress count
+                if attempt > self.retries:
+                    raise
+                delay = min(self.retry_backoff * 2 ** (attempt - 1), 30)
+                print(f"[!] Transfer of {path} interrupted after {received} bytes. Resuming in {delay:.0f}s...\n    Error detail: {e}\n")
+                await asyncio.sleep(delay)
+
+        if decoder:
+            decoder.close()
+
+    async def ls(self, path: Optional[str] = None) -> list[str]:
+        """Get list of files and dirs at `path`. Uses current working dir if no path specified (see `Mirror.ls`)"""
+        if path:
+            self._expect(await self._command(f"CWD {path}"), "2")
+            self.cwd = path
+
+        # Try nlst, then fallback to dir
+        try:
+            return await self._retrlines("NLST")
+        except all_errors as e:
+            print(f"[!] Encountered a server error while attempting nlst call. Will attempt LIST call.\n    Error detail: {e}\n")
+
+        try:
+            return DirListing.parse_list_lines(await self._retrlines("LIST"), UnixDirEntry).filenames()
+        except all_errors as e:
+            print(
+                "[!] Encountered a server error while attempting LIST call. Please check your network settings, and that the server is currently up.\n"
+                f"    Error detail: {e}\n"
+            )
+        return []
+
+    async def _retrlines(self, cmd: str) -> list[str]:
+        """Run a text mode transfer command, returning the lines of its response"""
+        self._expect(await self._command("TYPE A"), "2")
+        data = BytesIO()
+        async for chunk in self._transfer(cmd):
+            data.write(chunk)
+        return data.getvalue().decode('utf-8').splitlines()
+
+    async def _transfer(self, cmd: str, rest: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Open a data connection in the current mode, send `cmd` over the control connection and yield what the
+            server sends back over the data connection, until it closes it and confirms the transfer completed
+        """
+        if self.passive_mode:
+            if self._writer.get_extra_info("socket").family == socket.AF_INET:
+                _, port = parse227(self._expect(await self._command("PASV"), "2"))
+                host = self._writer.get_extra_info("peername")[0]  # As in ftplib, don't trust the host the server sends
+            else:
+                host, port = parse229(self._expect(await self._command("EPSV"), "2"), self._writer.get_extra_info("peername"))
+            data_reader, data_writer = await asyncio.open_connection(host, port)
+            try:
+                await self._start_transfer(cmd, rest)
+            except BaseException:
+                data_writer.close()
+                raise
+        else:
+            accepted = asyncio.get_running_loop().create_future()
+
+            def on_accept(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+                if not accepted.done():
+                    accepted.set_result((reader, writer))
+
+            host = self._writer.get_extra_info("sockname")[0]
+            listener = await asyncio.start_server(on_accept, host, 0)
+            try:
+                port = listener.sockets[0].getsockname()[1]
+                if listener.sockets[0].family == socket.AF_INET:
+                    self._expect(await self._command(f"PORT {host.replace('.', ',')},{port >> 8},{port & 0xFF}"), "2")
+                else:
+                    self._expect(await self._command(f"EPRT |2|{host}|{port}|"), "2")
+                await self._start_transfer(cmd, rest)
+                data_reader, data_writer = await accepted
+            finally:
+                listener.close()
+
+        try:
+            while chunk := await data_reader.read(READ_BLOCK_SIZE):
+                yield chunk
+        finally:
+            data_writer.close()
+        self._expect(await self._read_response(), "2")
+
+    async def _start_transfer(self, cmd: str, rest: Optional[int]) -> None:
+        if rest is not None:
+            self._expect(await self._command(f"REST {rest}"), "3")
+        self._expect(await self._command(cmd), "1")
+
+    async def _command(self, cmd: str) -> str:
+        if self.debug_level:
+            print("*cmd*", repr("PASS ****" if cmd.startswith("PASS ") else cmd))
+        self._writer.write(f"{cmd}\r\n".encode('utf-8'))
+        await self._writer.drain()
+        return await self._read_response()
+
+    async def _read_response(self) -> str:
+        """Read a (possibly multi-line) response from the control connection"""
+        lines = [await self._read_line()]
+        if lines[0][3:4] == "-":
+            while not (lines[-1][:3] == lines[0][:3] and lines[-1][3:4] == " "):
+                lines.append(await self._read_line())
+        response = "\n".join(lines)
+        if self.debug_level:
+            print("*resp*", repr(response))
+        return response
+
+    async def _read_line(self) -> str:
+        line = await self._reader.readline()
+        if not line:
+            raise EOFError("Control connection closed by server")
+        return line.decode('utf-8').rstrip("\r\n")
+
+    @staticmethod
+    def _expect(response: str, code_class: str) -> str:
+        """Raise the ftplib exception matching `response`, unless its code is in the expected class (first digit)"""
+        if response[:1] == code_class:
+            return response
+        if response[:1] == "4":
+            raise error_temp(response)
+        if response[:1] == "5":
+            raise error_perm(response)
+        raise error_reply(response)
+
+
+def report_invalid_line(line_no: int) -> None:
+    print(f"[!] Found potentially invalid entry on line {line_no}. Skipping...")
+
+
+class MirrorPool:
+    """A bounded pool of logged in Mirror connections that can be shared between threads.
+        Connections are opened lazily, so no more logins happen than there are concurrent users of the pool.
+    """
+    def __init__(
+        self, url: str, size: int, debug_level: int = 0, passive_mode: bool = False, cache: Optional[MirrorCache] = None,
+        retries: int = 5
+    ):
+        self.url = url
+        self.size = max(1, size)
+        self.cache = cache
+        self.retries = retries
+        self.debug_level = debug_level
+        self.passive_mode = passive_mode
+        self._idle = Queue()
+        self._opened = 0
+        self._lock = Lock()
+
+    @contextmanager
+    def connection(self) -> Iterator[Mirror]:
+        """Borrow a connection from the pool for the duration of the `with` block, waiting for one if all are in use.
+            If the block raises, the connection may have been left mid-transfer, so it is closed rather than reused.
+        """
+        mirror = self._acquire()
+        try:
+            yield mirror
+        except BaseException:
+            try:
+                mirror.ftp.close()
+            finally:
+                self._release_slot()
+            raise
+        self._idle.put(mirror)
+
+    def _acquire(self) -> Mirror:
+        while True:
+            try:
+                mirror = self._idle.get_nowait()
+            except Empty:
+                with self._lock:
+                    open_new = self._opened < self.size
+                    if open_new:
+                        self._opened += 1
+                if open_new:
+                    break
+                mirror = self._idle.get()
+            if mirror is not None:
+                return mirror
+            # None marks a slot given up by a failed or closed connection: go round again to open one in its place
+
+        try:
+            mirror = Mirror(self.url, self.cache, self.retries)
+            mirror.set_debug_level(self.debug_level)
+            mirror.set_passive_mode(self.passive_mode)
+        except BaseException:
+            self._release_slot()
+            raise
+        return mirror
+
+    def _release_slot(self) -> None:
+        """Give up a connection's slot, waking anyone waiting on the pool so they can open a connection in its place"""
+        with self._lock:
+            self._opened -= 1
+        self._idle.put(None)
+
+
+class SpaceSaving:
+    """Space-Saving heavy hitter sketch (Metwally, Agrawal & El Abbadi, 2005): approximate counts of the most frequent
+        keys in a stream, in a fixed budget of `capacity` counters no matter how many distinct keys the stream holds.
+
+    Each tracked key's count is an overestimate by at most its recorded error, so its true count lies in
+        [count - error, count]. Every key whose true count exceeds (total / capacity) is guaranteed to be tracked.
+        Counters are grouped into buckets by count, so every update (including evicting the minimum) is O(1).
+    """
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("Sketch capacity must be at least 1")
+        self.capacity = capacity
+        self.total = 0
+        self._counts = {}
+        self._errors = {}
+        self._buckets = {}      # count -> keys with that count, as an insertion ordered dict (oldest are evicted first)
+        self._min_count = 0
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __getitem__(self, key) -> int:
+        """Estimated count of `key` (0 if untracked - its true count is then at most the smallest tracked count)"""
+        return self._counts.get(key, 0)
+
+    def error_of(self, key) -> int:
+        """Error bound on the estimated count of `key`. A tracked key's estimate may overcount by up to this much,
+            while an untracked key (estimated as 0) may really have been seen up to this many times
+        """
+        return self._errors.get(key, self._min_count)
+
+    def add(self, key) -> None:
+        self.total += 1
+        counts = self._counts
+        buckets = self._buckets
+        if (count := counts.get(key)) is None:
+            if len(counts) < self.capacity:
+                count = 0
+                self._errors[key] = 0
+                self._min_count = 1
+            else:
+                # Replace a key with the minimum count - the newcomer inherits that count as its possible overestimate
+                count = self._min_count
+                victim_bucket = buckets[count]
+                victim = next(iter(victim_bucket))
+                del victim_bucket[victim], counts[victim], self._errors[victim]
+                self._errors[key] = count
+                if not victim_bucket:
+                    del buckets[count]
+                    self._min_count = count + 1     # Where the newcomer is about to go
+        else:
+            bucket = buckets[count]
+            del bucket[key]
+            if not bucket:
+                del buckets[count]
+                if count == self._min_count:
+                    self._min_count = count + 1     # The key just moved there, so the next bucket up is never empty
+
+        counts[key] = count + 1
+        buckets.setdefault(count + 1, {})[key] = None
+
+    def update(self, keys: Iterable) -> None:
+        add = self.add
+        for key in keys:
+            add(key)
+
+    def most_common(self, n: Optional[int] = None) -> list[tuple[object, int]]:
+        ranked = sorted(self._counts.items(), key=itemgetter(1), reverse=True)
+        return ranked if n is None else ranked[:n]
+
+
+class PackageCounter:
+    """Counts packages by number of associated files, from content index data fed in as arbitrarily sized chunks of bytes.
+        A line split across two chunks is carried over until its end arrives, so chunks can be fed straight off a download.
+
+    With `fast` set, lines are never decoded or tokenised: the package column is sliced straight out of the raw bytes after
+        the last space, and counted under bytes keys. Only the names that make it into `most_common` are decoded.
+        This matches `parse_content_index_entry` for every well-formed index line (it only differs on lines whose
+        trailing whitespace contains tabs or other non-space characters).
+
+    With `sketch_size` set, packages are counted approximately in a SpaceSaving sketch of that many counters instead of
+        an exact Counter, so memory stays fixed however many distinct packages are fed in. See `error_of` for the bounds.
+
+    With `package_count` set, packages are counted into that existing Counter or SpaceSaving (and `sketch_size` is ignored).
+        Counters sharing one `package_count` merge several indexes, while each keeps its own line numbering.
+    """
+    def __init__(
+        self, fast: bool = False, on_invalid_line: Callable[[int], None] = None, sketch_size: Optional[int] = None,
+        package_count: Optional[Union[Counter, SpaceSaving]] = None
+    ):
+        if package_count is None:
+            package_count = Counter() if sketch_size is None else SpaceSaving(sketch_size)
+        self.package_count = package_count
+        self.line_count = 0
+        self.fast = fast
+        self.on_invalid_line = on_invalid_line or report_invalid_line
+        self._partial_line = b""
+        self._iter_packages = self._iter_packages_fast if fast else self._iter_packages_parsed
+
+    @property
+    def exact(self) -> bool:
+        return isinstance(self.package_count, Counter)
+
+    def feed(self, chunk: bytes) -> None:
+        """Count every complete line in `chunk`, holding back any trailing partial line for the next call"""
+        lines = (self._partial_line + chunk).split(b"\n")
+        self._partial_line = lines.pop()
+        self._count_lines(lines)
+
+    def close(self) -> None:
+        """Count the final line of the index, if it was not newline terminated"""
+        if self._partial_line:
+            self._count_lines([self._partial_line])
+            self._partial_line = b""
+
+    def __enter__(self) -> PackageCounter:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def count_of(self, package: str) -> int:
+        """Number of files associated with `package` (0 if it doesn't appear in the index)"""
+        return self.package_count[self._key(package)]
+
+    def error_of(self, package: str) -> int:
+        """How far `count_of(package)` may overestimate the true count. Always 0 unless counting approximately"""
+        return 0 if self.exact else self.package_count.error_of(self._key(package))
+
+    def most_common(self, n: Optional[int] = None) -> list[tuple[str, int]]:
+        if self.fast:
+            return [(p.decode('utf-8'), count) for p, count in self.package_count.most_common(n)]
+        return self.package_count.most_common(n)
+
+    def _key(self, package: str) -> Union[str, bytes]:
+        return package.encode('utf-8') if self.fast else package
+
+    def _count_lines(self, lines: list[bytes]) -> None:
+        # Counter.update tallies an iterable in C, which is much cheaper than `package_count[p] += 1` per package
+        self.package_count.update(self._iter_packages(lines))
+        self.line_count += len(lines)
+
+    def _iter_packages_parsed(self, lines: list[bytes]) -> Iterator[str]:
+        for i, raw_line in enumerate(lines, self.line_count):
+            if not (line := parse_content_index_entry(raw_line.decode('utf-8').rstrip('\r'))):
+                self.on_invalid_line(i)
+                continue
+            yield from line[-1].split(',')  # Split list of packages in rhs column
+
+    def _iter_packages_fast(self, lines: list[bytes]) -> Iterator[bytes]:
+        for i, raw_line in enumerate(lines, self.line_count):
+            # Same validity rule as parse_content_index_entry: a record needs a space between its two columns
+            if b' ' in raw_line:
+                raw_line = raw_line.rstrip()
+                packages = raw_line[raw_line.rfind(b' ') + 1:]
+                if packages:
+                    if b',' in packages:    # Most records belong to exactly one package - only split when needed
+                        yield from packages.split(b',')
+                    else:
+                        yield packages
+                    continue
+            self.on_invalid_line(i)
+
+
+def top_n_packages_by_files(index_data: Union[bytes, str], n: int = 10, fast: bool = False) -> list[tuple[str, int]]:
     """Given the raw bytes or decoded string of a content index file, determine the top n packages by file quantity
 
     Args:
         index_data (Union[bytes, str]): contents of index file, as raw bytes or string
         n (int, optional): Top n packages to collect. Defaults to 10.
+        fast (bool, optional): Count using the bytes-native parser (see `PackageCounter`). Defaults to False.
 
     Returns:
         list[tuple[str, int]]: A list of the top n packages, where the tuple is of form: (<package_name>, <occurances>)
     """
-    package_count = Counter()
-    index_txt = index_data.decode('utf-8') if isinstance(index_data, bytes) else index_data
+    counter = PackageCounter(fast)
+    counter.feed(index_data.encode('utf-8') if isinstance(index_data, str) else index_data)
+    counter.close()
+    return counter.most_common(n)
 
-    for i, raw_line in enumerate(iter(index_txt.splitlines())):
-        if not (line := parse_content_index_entry(raw_line)):
-            print(f"[!] Found potentially invalid entry on line {i}. Skipping...")
-            continue
-        for p in line[-1].split(','):   # Split list of packages in rhs column
-            package_count[p] += 1
-    return package_count.most_common(n)
+
+def shard_ranges(path: str, shards: int) -> list[tuple[int, int]]:
+    """Split the file at `path` into up to `shards` contiguous (start, end) byte ranges of roughly equal size.
+        Every boundary is moved forward to just past a newline, so no line is ever split between two ranges.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+
+    bounds = [0]
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for i in range(1, shards):
+            start = max(size * i // shards, bounds[-1])
+            newline = data.find(b"\n", start)
+            if newline == -1:
+                break
+            bounds.append(newline + 1)
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+
+def count_index_range(path: str, start: int, end: int, fast: bool = False) -> tuple[Counter, int, list[int]]:
+    """Count the packages in bytes [start, end) of a decompressed content index file. Runs in a worker process.
+
+    Returns:
+        tuple[Counter, int, list[int]]: The package counts, the number of lines in the range,
+            and the line numbers (relative to `start`) of any invalid entries
+    """
+    invalid_lines = []
+    counter = PackageCounter(fast, invalid_lines.append)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for offset in range(start, end, READ_BLOCK_SIZE * 16):
+            counter.feed(data[offset:min(offset + READ_BLOCK_SIZE * 16, end)])
+    counter.close()
+    return counter.package_count, counter.line_count, invalid_lines
+
+
+def count_index_file(
+    path: str, workers: int, fast: bool = False, on_invalid_line: Callable[[int], None] = None
+) -> PackageCounter:
+    """Count a decompressed content index file across `workers` processes, one line-aligned shard each.
+        Shard results are merged in file order, so counts, tie order in `most_common` and invalid line warnings
+        (with their line numbers) all come out exactly as they would from a single PackageCounter.
+    """
+    total = PackageCounter(fast, on_invalid_line)
+    ranges = shard_ranges(path, workers)
+    with ProcessPoolExecutor(workers) as pool:
+        shard_results = pool.map(
+            count_index_range,
+            repeat(path), [start for start, _ in ranges], [end for _, end in ranges], repeat(fast)
+        )
+        for package_count, line_count, invalid_lines in shard_results:
+            for line_no in invalid_lines:
+                total.on_invalid_line(total.line_count + line_no)
+            total.package_count.update(package_count)
+            total.line_count += line_count
+    return total
+
+
+def count_contents(
+    mirror: Mirror, path: str, fast: bool = False, workers: int = 1, on_invalid_line: Callable[[int], None] = None,
+    sketch_size: Optional[int] = None, validator: Optional[str] = None
+) -> PackageCounter:
+    """Download and count the gzipped content index at `path` on `mirror`.
+        With a single worker the index is counted as it streams in. With more, it is decompressed to a staging file
+        as it downloads, which is then counted in parallel shards (see `count_index_file`).
+        Approximate counting (`sketch_size`, see PackageCounter) is only supported with a single worker.
+        `validator` is passed on to `Mirror.read_stream`.
+    """
+    if workers <= 1 or sketch_size is not None:
+        counter = PackageCounter(fast, on_invalid_line, sketch_size)
+        mirror.read_stream(path, counter.feed, gzip_unzip=True, validator=validator)
+        counter.close()
+        return counter
+
+    with TemporaryDirectory() as staging_dir:
+        index_path = os.path.join(staging_dir, "Contents")
+        with open(index_path, 'wb') as index_file:
+            mirror.read_stream(path, index_file.write, gzip_unzip=True, validator=validator)
+        return count_index_file(index_path, workers, fast, on_invalid_line)
+
+
+def count_contents_indexed(
+    mirror: Mirror, path: str, fast: bool = False, workers: int = 1, on_invalid_line: Callable[[int], None] = None,
+    sketch_size: Optional[int] = None
+) -> Union[PackageIndex, PackageCounter]:
+    """As `count_contents`, but reusing a persisted PackageIndex if the mirror's cache already holds this exact
+        version of the content index. Otherwise the index is counted, and (if counted exactly) persisted for next time.
+        The remote file is only `stat`ed once, for both cache checks and the download. Close the result when done with it.
+    """
+    validator = mirror.stat(path) if mirror.cache is not None else None
+    if validator is None:   # Nothing can be cached without one
+        return count_contents(mirror, path, fast, workers, on_invalid_line, sketch_size)
+
+    if (checksum := mirror.cached_checksum(path, validator)) is not None:
+        try:
+            return PackageIndex(mirror.cache.package_index_path(mirror.url, path, checksum))
+        except (OSError, ValueError):
+            pass
+
+    counter = count_contents(mirror, path, fast, workers, on_invalid_line, sketch_size, validator)
+    if counter.exact and (checksum := mirror.cached_checksum(path, validator)) is not None:
+        mirror.cache.store_package_index(mirror.url, path, checksum, counter)
+    return counter
+
+
+def count_all_contents(
+    pool: MirrorPool, content_files: dict[str, str], fast: bool = False, workers: int = 1,
+    sketch_size: Optional[int] = None
+) -> dict[str, tuple[Union[PackageIndex, PackageCounter], list[int]]]:
+    """Download and count every content index in `content_files` (as returned by `extract_architectures`) concurrently,
+        one transfer per pooled connection. Invalid line numbers are collected per architecture rather than printed,
+        so warnings from concurrent downloads don't interleave.
+
+    Returns:
+        dict[str, tuple[Union[PackageIndex, PackageCounter], list[int]]]: For each architecture, its counts and any
+            invalid line numbers
+    """
+    def count_arch(filename: str) -> tuple[Union[PackageIndex, PackageCounter], list[int]]:
+        invalid_lines = []
+        with pool.connection() as mirror:
+            counter = count_contents_indexed(
+                mirror, f"{REPO_PATH}{filename}", fast, workers, invalid_lines.append, sketch_size
+            )
+        return counter, invalid_lines
+
+    with ThreadPoolExecutor(pool.size) as executor:
+        return dict(zip(content_files, executor.map(count_arch, content_files.values())))
+
+
+async def count_all_contents_async(
+    url: str, content_files: dict[str, str], connections: int = 4, fast: bool = False, passive_mode: bool = False,
+    debug_level: int = 0, retries: int = 5, sketch_size: Optional[int] = None
+) -> dict[str, tuple[PackageCounter, list[int]]]:
+    """As `count_all_contents`, but with every transfer driven from the running asyncio event loop instead of a thread
+        pool. Up to `connections` content indexes are streamed and counted at once, each over its own AsyncMirror.
+        The download cache and --workers aren't used here - every index is streamed and counted as it arrives.
+    """
+    slots = asyncio.Semaphore(max(1, connections))
+
+    async def count_arch(filename: str) -> tuple[PackageCounter, list[int]]:
+        invalid_lines = []
+        counter = PackageCounter(fast, invalid_lines.append, sketch_size)
+        mirror = AsyncMirror(url, retries=retries)
+        mirror.set_passive_mode(passive_mode)
+        mirror.set_debug_level(debug_level)
+        async with slots, mirror:
+            await mirror.read_stream(f"{REPO_PATH}{filename}", counter.feed, gzip_unzip=True)
+        counter.close()
+        return counter, invalid_lines
+
+    return dict(zip(content_files, await asyncio.gather(*map(count_arch, content_files.values()))))
+
+
+class ScanAborted(Exception):
+    """Raised inside a scan's download thread to abandon its transfer once counting has failed"""
+
+
+def find_scan_targets(
+    mirror: Mirror, suites: list[str], components: list[str], arch: Optional[str] = None
+) -> dict[str, str]:
+    """List every content index under each suite/component pair of `DISTS_PATH`, optionally only those for `arch`.
+        Pairs the mirror doesn't carry are skipped with a warning.
+
+    Returns:
+        dict[str, str]: Keys are groups of the form "suite/component/arch", values are the full paths of their indexes
+    """
+    targets = {}
+    for suite in suites:
+        for component in components:
+            component_path = f"{DISTS_PATH}{suite}/{component}/"
+            try:
+                content_files = extract_architectures(mirror.ls(component_path))
+            except error_perm as e:
+                print(f"[!] Could not list {component_path}, skipping it.\n    Error detail: {e}\n")
+                continue
+            for file_arch, filename in content_files.items():
+                if arch is None or file_arch == arch:
+                    targets[f"{suite}/{component}/{file_arch}"] = f"{component_path}{filename}"
+    return targets
+
+
+def scan_contents(
+    mirror: Mirror, targets: dict[str, str], fast: bool = False, sketch_size: Optional[int] = None, merge: bool = False
+) -> dict[str, tuple[PackageCounter, list[int]]]:
+    """Download and count every content index in `targets` (as returned by `find_scan_targets`) one after another over
+        the single connection `mirror`, pipelined: a download thread queues each index's compressed chunks while this
+        thread decompresses and counts them, so counting one index overlaps fetching the next. The queue is bounded,
+        so the download only ever runs SCAN_QUEUE_CHUNKS chunks ahead of counting.
+
+    With `merge` set, every returned counter shares one set of counts (see PackageCounter), holding the totals across
+        all of `targets`. Invalid line numbers are still collected per group.
+
+    Returns:
+        dict[str, tuple[PackageCounter, list[int]]]: For each group, its counts and any invalid line numbers
+    """
+    chunks = Queue(SCAN_QUEUE_CHUNKS)
+    stop = Event()
+
+    def put(item: tuple) -> None:
+        while True:
+            if stop.is_set():
+                raise ScanAborted
+            try:
+                return chunks.put(item, timeout=0.1)
+            except Full:
+                pass
+
+    def download() -> None:
+        try:
+            for path in targets.values():
+                mirror.read_stream(path, lambda chunk: put((chunk, None)))
+                put((None, None))   # End of this index
+        except ScanAborted:
+            pass
+        except BaseException as e:
+            put((None, e))
+
+    shared_count = None
+    if merge:
+        shared_count = Counter() if sketch_size is None else SpaceSaving(sketch_size)
+
+    results = {}
+    producer = Thread(target=download, name="scan-download", daemon=True)
+    producer.start()
+    try:
+        for group in targets:
+            invalid_lines = []
+            counter = PackageCounter(fast, invalid_lines.append, sketch_size, shared_count)
+            decoder = GzipStreamDecoder(counter.feed)
+            while True:
+                chunk, error = chunks.get()
+                if error is not None:
+                    raise error
+                if chunk is None:
+                    break
+                decoder.write(chunk)
+            decoder.close()
+            counter.close()
+            results[group] = counter, invalid_lines
+    finally:
+        stop.set()
+        producer.join()
+    return results
+
+
+def print_package_files(counts: Union[PackageIndex, PackageCounter], package: str) -> None:
+    if counts.exact:
+        print(f"Package {package} has {counts.count_of(package)} associated files")
+    else:
+        print(f"Package {package} has ~{counts.count_of(package)} (±{counts.error_of(package)}) associated files")
+    print()
+
+
+def print_top_packages(top_packages: list[tuple[str, int]], n: int, error_bounds: Optional[list[int]] = None) -> None:
+    """Print the output of `top_n_packages_by_files` (or `PackageCounter.most_common`) as a ranked table.
+        If `error_bounds` are given, the counts are reported as approximate, each with its corresponding bound.
+    """
+    if error_bounds is None:
+        print(f"Top {n} packages by number of associated files (exact):")
+        for i, package in enumerate(top_packages):
+            print(f"  {i+1:>3}: [{package[1]:>5}] {package[0]}")
+    else:
+        print(f"Top {n} packages by number of associated files (approximate, counts may overestimate by up to ±):")
+        for i, (package, error) in enumerate(zip(top_packages, error_bounds)):
+            print(f"  {i+1:>3}: [{package[1]:>5} ±{error:<5}] {package[0]}")
+    print()
+
+
+def print_report(counts: Union[PackageIndex, PackageCounter], n: int, package: Optional[str] = None) -> None:
+    """Print the top `n` packages from `counts`, and the file count for `package` if given"""
+    top_packages = counts.most_common(n)
+    error_bounds = None if counts.exact else [counts.error_of(p) for p, _ in top_packages]
+    print_top_packages(top_packages, n, error_bounds)
+    if package:
+        print_package_files(counts, package)
 
 
 def parse_args() -> dict:
     parser = ArgumentParser(
         description="Retrieve statistics about packages for a given architecture"
     )
-    parser.add_argument("arch", help="Architecture to retrieve statistics for")
+    parser.add_argument(
+        "arch", nargs="?", help="Architecture to retrieve statistics for. With --scan, only scan this architecture's indexes"
+    )
     parser.add_argument(
         "-v", "--verbose",
         default=0,
@@ -288,38 +1460,191 @@ def parse_args() -> dict:
         default=False,
         help="Run FTP operations in passive mode. Try this if encountering connection / socket issues."
     )
+    parser.add_argument(
+        "--fast-parse",
+        action=BooleanOptionalAction,
+        default=False,
+        help="Count packages straight from the raw bytes of the index, without decoding or tokenising each line."
+    )
+    parser.add_argument(
+        "-w", "--workers",
+        default=1,
+        type=int,
+        required=False,
+        help="Count the index across this many processes. The decompressed index is staged on disk first. Defaults to 1"
+    )
+    parser.add_argument(
+        "-a", "--approximate",
+        default=None,
+        type=int,
+        required=False,
+        metavar="COUNTERS",
+        help="Count approximately, tracking at most this many packages at once (a fixed memory budget of roughly "
+             "200 bytes per counter). Results are reported with an error bound. Can't be combined with --workers."
+    )
+    parser.add_argument(
+        "--all-archs",
+        action=BooleanOptionalAction,
+        default=False,
+        help="Retrieve statistics for every available architecture, downloading several at once."
+    )
+    parser.add_argument(
+        "-c", "--connections",
+        default=4,
+        type=int,
+        required=False,
+        help="With --all-archs, how many FTP connections to download over concurrently. Defaults to 4"
+    )
+    parser.add_argument(
+        "--async-ftp",
+        action=BooleanOptionalAction,
+        default=False,
+        help="With --all-archs, drive every download from one asyncio event loop instead of a thread per connection. "
+             "Bypasses the download cache. Can't be combined with --workers."
+    )
+    parser.add_argument(
+        "--scan",
+        action=BooleanOptionalAction,
+        default=False,
+        help="Scan the content indexes of every --suites and --components pair over one connection, counting each "
+             "index while the next downloads. Scans every architecture unless one is given."
+    )
+    parser.add_argument(
+        "--suites",
+        nargs="+",
+        default=["stable"],
+        help="With --scan, the dists to scan. Defaults to stable"
+    )
+    parser.add_argument(
+        "--components",
+        nargs="+",
+        default=["main"],
+        help="With --scan, the components of each suite to scan. Defaults to main"
+    )
+    parser.add_argument(
+        "--merge",
+        action=BooleanOptionalAction,
+        default=False,
+        help="With --scan, print one report totalled across every scanned index instead of one per index."
+    )
+    parser.add_argument(
+        "--cache",
+        action=BooleanOptionalAction,
+        default=True,
+        help="Keep downloaded files and listings in an on-disk cache, and reuse them while the mirror is unchanged."
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=CACHE_DIR,
+        required=False,
+        help=f"Directory to keep the download cache in. Defaults to {CACHE_DIR}"
+    )
+    parser.add_argument(
+        "--cache-size",
+        default=512,
+        type=int,
+        required=False,
+        help="Maximum size of the download cache in MiB, beyond which least recently used files are evicted. Defaults to 512"
+    )
 
-    return parser.parse_args()
+    parser.add_argument(
+        "--retries",
+        default=5,
+        type=int,
+        required=False,
+        help="How many times in a row to reconnect and resume an interrupted download before giving up. Defaults to 5"
+    )
+    parser.add_argument(
+        "-p", "--package",
+        default=None,
+        required=False,
+        help="Also report how many files are associated with this package."
+    )
+
+    args = parser.parse_args()
+    if not args.arch and not (args.all_archs or args.scan):
+        parser.error("an architecture is required, unless --all-archs or --scan is given")
+    if args.scan and (args.all_archs or args.workers > 1):
+        parser.error("--scan can't be combined with --all-archs or --workers")
+    if args.approximate is not None and (args.approximate < 1 or args.workers > 1):
+        parser.error("--approximate needs at least 1 counter, and can't be combined with --workers")
+    if args.async_ftp and (not args.all_archs or args.workers > 1):
+        parser.error("--async-ftp needs --all-archs, and can't be combined with --workers")
+    return args
 
 
 def main():
-    # Collect args, init ftp wrapper for mirror
+    # Collect args, init pool of ftp wrappers for mirror
     args = parse_args()
-    mirror = Mirror(MIRROR)
-    mirror.set_debug_level(args.verbose)
-    mirror.set_passive_mode(args.passive_mode)
+    cache = MirrorCache(args.cache_dir, args.cache_size << 20) if args.cache else None
+    pool = MirrorPool(
+        MIRROR, args.connections if args.all_archs else 1, args.verbose, args.passive_mode, cache, args.retries
+    )
+
+    if args.scan:
+        # Walk every suite/component pair over a single connection, counting each index while the next downloads
+        with pool.connection() as mirror:
+            targets = find_scan_targets(mirror, args.suites, args.components, args.arch)
+            if not targets:
+                print("[!] No content indexes were found to scan. Please note any errors above, and retry.")
+                exit(1)
+            group_counts = scan_contents(mirror, targets, args.fast_parse, args.approximate, args.merge)
+
+        for group, (counter, invalid_lines) in group_counts.items():
+            if args.merge and not invalid_lines:
+                continue
+            print(f"== {group} ==")
+            for line_no in invalid_lines:
+                report_invalid_line(line_no)
+            if not args.merge:
+                print_report(counter, args.top_n, args.package)
+        if args.merge:
+            print(f"== merged: {len(group_counts)} indexes across {', '.join(args.suites)} / {', '.join(args.components)} ==")
+            print_report(counter, args.top_n, args.package)
+        return 0
 
     # Collect dict of available architectures (keys), and their filepaths (vals)
-    content_files = extract_architectures(mirror.ls(REPO_PATH))
+    with pool.connection() as mirror:
+        content_files = extract_architectures(mirror.ls(REPO_PATH))
 
     if not content_files:
         print("[!] No files were found. Please note any errors above, and retry.")
         exit(1)
 
+    if args.all_archs:
+        # Download and count every architecture concurrently, then print one report per architecture
+        if args.async_ftp:
+            arch_counts = asyncio.run(count_all_contents_async(
+                MIRROR, content_files, args.connections, args.fast_parse, args.passive_mode, args.verbose, args.retries,
+                args.approximate
+            ))
+        else:
+            arch_counts = count_all_contents(pool, content_files, args.fast_parse, args.workers, args.approximate)
+
+        for arch, (counter, invalid_lines) in arch_counts.items():
+            with counter:
+                print(f"== {arch} ==")
+                for line_no in invalid_lines:
+                    report_invalid_line(line_no)
+                print_report(counter, args.top_n, args.package)
+        return 0
+
     # Print the list of available architectures if an invalid one was passed through argv
     if args.arch not in content_files:
         print(f'Content file not available for architecture "{args.arch}". Available options:')
         print_valid_archs(content_files)
         exit(1)
 
-    # Read in the relevant content index file via ftp, gzip decompress in-memory, and decode bytes to utf-8 str
-    index_data = mirror.read(content_files[args.arch], gzip_unzip=True)
+    # Stream the relevant content index file via ftp, gzip decompressing and counting it as it arrives
+    # (or if this version of it has been counted before, load its persisted counts instead)
+    with pool.connection() as mirror:
+        counter = count_contents_indexed(
+            mirror, f"{REPO_PATH}{content_files[args.arch]}", args.fast_parse, args.workers, sketch_size=args.approximate
+        )
 
     # Print and exit
-    print(f"Top {args.top_n} packages by number of associated files:")
-    for i, package in enumerate(top_n_packages_by_files(index_data, args.top_n)):
-        print(f"  {i+1:>3}: [{package[1]:>5}] {package[0]}")
-    print()
+    with counter:
+        print_report(counter, args.top_n, args.package)
     return 0
 
 
@@ -0,0 +1,75 @@
+# Tests for ArrayBinarySearchTree, checked against BinarySearchTree and a set
+
+from random import Random
+
+import pytest
+
+from array_binary_search_tree import NIL, ArrayBinarySearchTree
+from binary_search_tree import BinarySearchTree
+
+
+def check_subtree(tree, node, low=None, high=None) -> tuple[int, int]:
+    """Check the ordering, cached height and size, and AVL balance of every node under node, returning its height and size"""
+    if node == NIL:
+        return 0, 0
+    item = tree.items[node]
+    assert low is None or item > low
+    assert high is None or item < high
+    left_height, left_size = check_subtree(tree, tree.lefts[node], low, item)
+    right_height, right_size = check_subtree(tree, tree.rights[node], item, high)
+    assert abs(left_height - right_height) <= 1
+    assert tree.heights[node] == max(left_height, right_height) + 1
+    assert tree.sizes[node] == left_size + right_size + 1
+    return tree.heights[node], tree.sizes[node]
+
+
+def test_matches_binary_search_tree():
+    rand = Random(0)
+    tree = ArrayBinarySearchTree(balanced=True)
+    reference_tree = BinarySearchTree(balanced=True)
+    reference = set()
+    for step in range(20_000):
+        item = rand.randrange(-500, 500)
+        if rand.random() < 0.55:
+            assert tree.insert(item) == reference_tree.insert(item) == (item not in reference)
+            reference.add(item)
+        elif item in reference:
+            tree.delete(item)
+            reference_tree.delete(item)
+            reference.remove(item)
+        else:
+            with pytest.raises(KeyError):
+                tree.delete(item)
+        assert (item in tree) == (item in reference)
+        if step % 500 == 0:
+            assert check_subtree(tree, tree.root)[1] == len(tree) == len(reference)
+            assert list(tree) == list(reference_tree) == sorted(reference)
+            if reference:
+                k = rand.randint(1, len(reference))
+                assert tree.kth_smallest(k) == reference_tree.kth_smallest(k)
+                assert tree.kth_largest(k) == reference_tree.kth_largest(k)
+            assert tree.rank(item) == reference_tree.rank(item)
+            assert tree.count_in_range(-100, 100) == reference_tree.count_in_range(-100, 100)
+    # Deleted nodes' slots are reused rather than the arrays growing
+    assert len(tree.items) <= 1 + 1_000
+
+
+@pytest.mark.parametrize("reuse_slot", [False, True])
+def test_rejected_item_leaves_tree_unchanged(reuse_slot):
+    tree = ArrayBinarySearchTree(balanced=True)
+    for item in range(5):
+        tree.insert(item)
+    if reuse_slot:     # Put a slot on the free list, so the next insert takes it rather than appending
+        tree.insert(9)
+        tree.delete(9)
+    arrays = [tree.items, tree.lefts, tree.rights, tree.heights, tree.sizes]
+    before = [list(values) for values in arrays], tree.root, tree.free
+
+    with pytest.raises(OverflowError):
+        tree.insert(2**70)
+    with pytest.raises(TypeError):
+        tree.insert(2.5)
+    assert ([list(values) for values in arrays], tree.root, tree.free) == before
+    assert len(tree) == tree.sizes[tree.root] == tree.count_in_range(-1, 100) == 5
+    assert list(tree) == [0, 1, 2, 3, 4]
+    check_subtree(tree, tree.root)
@@ -0,0 +1,107 @@
+# Tests for BinarySearchTree: AVL balance under random inserts and deletes, and order statistics from subtree sizes,
+# checked against a set and sorted()
+
+from math import log2
+from pathlib import Path
+from random import Random
+from runpy import run_path
+
+import pytest
+
+from binary_search_tree import BinarySearchTree
+
+# The script's name isn't a valid module name, so load its function by path
+find_largest = run_path(str(Path(__file__).with_name("BST-find_k_largest.py")))["find_largest"]
+
+
+def check_subtree(node, low=None, high=None, balanced=True) -> int:
+    """Check the ordering, cached height and (if balanced) AVL balance of every node under node, returning its height"""
+    if node is None:
+        return 0
+    assert low is None or node.item > low
+    assert high is None or node.item < high
+    left = check_subtree(node.left, low, node.item, balanced)
+    right = check_subtree(node.right, node.item, high, balanced)
+    assert node.height == max(left, right) + 1
+    if balanced:
+        assert abs(left - right) <= 1
+    return node.height
+
+
+@pytest.mark.parametrize("balanced", [True, False])
+def test_matches_set(balanced):
+    rand = Random(0)
+    tree = BinarySearchTree(balanced)
+    reference = set()
+    for step in range(20_000):
+        item = rand.randrange(500)
+        if rand.random() < 0.55:
+            assert tree.insert(item) == (item not in reference)
+            reference.add(item)
+        elif item in reference:
+            tree.delete(item)
+            reference.remove(item)
+        else:
+            with pytest.raises(KeyError):
+                tree.delete(item)
+        assert (item in tree) == (item in reference)
+        if step % 500 == 0:
+            check_subtree(tree.root, balanced=balanced)
+            assert list(tree) == sorted(reference)
+            assert tree.find_min() == min(reference, default=None)
+            assert tree.find_max() == max(reference, default=None)
+    check_subtree(tree.root, balanced=balanced)
+    assert len(tree) == len(reference)
+
+
+def test_sorted_input_stays_shallow():
+    tree = BinarySearchTree(balanced=True)
+    size = 100_000
+    for item in range(size):
+        tree.insert(item)
+    assert tree.root.height <= 1.45 * log2(size + 2)
+    assert (tree.find_min(), tree.find_max()) == (0, size - 1)
+    assert size // 2 in tree and size not in tree
+    for item in range(0, size, 2):
+        tree.delete(item)
+    check_subtree(tree.root)
+    assert list(tree) == list(range(1, size, 2))
+
+
+def check_sizes(node) -> int:
+    """Check the cached subtree size of every node under node, returning its size"""
+    if node is None:
+        return 0
+    size = check_sizes(node.left) + check_sizes(node.right) + 1
+    assert node.size == size
+    return size
+
+
+@pytest.mark.parametrize("balanced", [True, False])
+def test_order_statistics_match_sorted(balanced):
+    rand = Random(1)
+    tree = BinarySearchTree(balanced)
+    reference = set()
+    for step in range(6_000):
+        item = rand.randrange(1_000)
+        if rand.random() < 0.6:
+            tree.insert(item)
+            reference.add(item)
+        elif item in reference:
+            tree.delete(item)
+            reference.remove(item)
+        if step % 200 == 0:
+            ordered = sorted(reference)
+            assert check_sizes(tree.root) == len(ordered)
+            for k in range(1, len(ordered) + 1):
+                assert tree.kth_smallest(k) == ordered[k - 1]
+                assert tree.kth_largest(k) == ordered[-k]
+            for k in (1, len(ordered) // 2 or 1, len(ordered)):
+                assert find_largest(tree.root, k) == ordered[-k]
+            for probe in range(-1, 1_001, 7):
+                assert tree.rank(probe) == sum(item < probe for item in ordered)
+            for k in (0, len(ordered) + 1):
+                with pytest.raises(IndexError):
+                    tree.kth_smallest(k)
+                with pytest.raises(IndexError):
+                    tree.kth_largest(k)
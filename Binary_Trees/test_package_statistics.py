@@ -0,0 +1,331 @@
+# Tests for package_statistics.py's mirror clients, run against the FTP stand-in rather than a real mirror
+
+import asyncio
+import ftplib
+import gzip
+import socket
+import sys
+import time
+from ftplib import all_errors, error_perm
+from hashlib import sha256
+from random import Random
+from threading import Event, Thread
+
+import pytest
+
+from ftp_stand_in import FTPStandIn
+from package_statistics import (
+    AsyncMirror, Mirror, MirrorCache, MirrorPool, PackageCounter, PackageIndex, count_all_contents, count_contents_indexed,
+    count_index_file, parse_args
+)
+
+DIST = "/debian/dists/stable/main"
+CONTENTS = f"{DIST}/Contents-amd64.gz"
+FILES = {
+    CONTENTS: Random(0).randbytes(300_000),
+    f"{DIST}/Contents-i386.gz": Random(1).randbytes(1_000),
+    f"{DIST}/binary-amd64/Release": b"Archive: stable\n",
+}
+MODES = {
+    "PORT": ("127.0.0.1", False),
+    "PASV": ("127.0.0.1", True),
+    "EPRT": ("::1", False),
+    "EPSV": ("::1", True),
+}
+
+
+def run_async_mirror(server: FTPStandIn, passive: bool, operation):
+    """Connect an AsyncMirror to `server` and return the result of awaiting `operation(mirror)`"""
+    async def session():
+        mirror = AsyncMirror(server.host, server.port, retry_backoff=0)
+        mirror.set_passive_mode(passive)
+        async with mirror:
+            return await operation(mirror)
+    return asyncio.run(session())
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_async_ls_and_read(mode):
+    host, passive = MODES[mode]
+    with FTPStandIn(FILES, host) as server:
+        listing = run_async_mirror(server, passive, lambda mirror: mirror.ls(DIST))
+        data = run_async_mirror(server, passive, lambda mirror: mirror.read(CONTENTS))
+        assert listing == ["Contents-amd64.gz", "Contents-i386.gz", "binary-amd64"]
+        assert data == FILES[CONTENTS]
+        assert server.count(mode) == 2
+        assert server.count("LIST") == 0
+
+
+def test_async_ls_falls_back_to_list():
+    with FTPStandIn(FILES, nlst=False) as server:
+        listing = run_async_mirror(server, False, lambda mirror: mirror.ls(DIST))
+        assert listing == ["Contents-amd64.gz", "Contents-i386.gz", "binary-amd64"]
+        assert server.count("NLST") == 1
+        assert server.count("LIST") == 1
+
+
+@pytest.mark.parametrize("mode", ["PORT", "PASV"])
+def test_async_read_resumes_with_rest(mode):
+    host, passive = MODES[mode]
+    with FTPStandIn(FILES, host) as server:
+        server.drops = [70_000, 100_000]
+        data = run_async_mirror(server, passive, lambda mirror: mirror.read(CONTENTS))
+        assert data == FILES[CONTENTS]
+        assert server.count("RETR") == 3
+        assert "REST 70000" in server.commands and "REST 170000" in server.commands
+        assert server.bytes_sent[CONTENTS] == len(FILES[CONTENTS])     # Nothing was sent twice
+
+
+def test_async_refused_login():
+    with FTPStandIn(FILES, user_reply="530") as server:
+        with pytest.raises(error_perm):
+            run_async_mirror(server, False, lambda mirror: mirror.ls(DIST))
+        assert server.count("PASS") == 0
+        assert server.count("CWD") == 0
+
+
+def test_async_login_without_password():
+    with FTPStandIn(FILES, user_reply="230") as server:
+        assert run_async_mirror(server, False, lambda mirror: mirror.read(CONTENTS)) == FILES[CONTENTS]
+        assert server.count("PASS") == 0
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """An FTPStandIn that Mirror connects to, since Mirror always uses the default FTP port"""
+    with FTPStandIn(FILES) as stand_in:
+        monkeypatch.setattr(ftplib.FTP, "port", stand_in.port)
+        yield stand_in
+
+
+def cached_mirror(server: FTPStandIn, cache: MirrorCache, retries: int = 5) -> Mirror:
+    return Mirror(server.host, cache, retries, retry_backoff=0)
+
+
+def test_cache_hit_transfers_nothing(server, tmp_path):
+    cache = MirrorCache(str(tmp_path))
+    assert cached_mirror(server, cache).read(CONTENTS) == FILES[CONTENTS]
+    assert cached_mirror(server, cache).read(CONTENTS) == FILES[CONTENTS]
+    assert server.count("RETR") == 1
+    assert server.bytes_sent[CONTENTS] == len(FILES[CONTENTS])
+
+
+@pytest.mark.parametrize("change", ["size", "mdtm"])
+def test_cache_refetches_changed_file(server, tmp_path, change):
+    cache = MirrorCache(str(tmp_path))
+    cached_mirror(server, cache).read(CONTENTS)
+    if change == "size":
+        server.files[CONTENTS] = FILES[CONTENTS] + b"appended"
+    else:
+        server.files[CONTENTS] = bytes(reversed(FILES[CONTENTS]))
+        server.mtimes[CONTENTS] = "20240101000000"
+    assert cached_mirror(server, cache).read(CONTENTS) == server.files[CONTENTS]
+    assert server.count("RETR") == 2
+    assert cached_mirror(server, cache).read(CONTENTS) == server.files[CONTENTS]
+    assert server.count("RETR") == 2
+
+
+def test_cache_evicts_least_recently_used(server, tmp_path):
+    paths = [f"{DIST}/Contents-{arch}.gz" for arch in ("arm64", "armhf", "mips64el")]
+    for i, path in enumerate(paths):
+        server.files[path] = Random(i).randbytes(1_000)
+        server.mtimes[path] = "20230101000000"
+    cache = MirrorCache(str(tmp_path), max_bytes=2_500)
+    mirror = cached_mirror(server, cache)
+
+    def cached(path: str) -> bool:
+        return cache.lookup(server.host, path, mirror.stat(path)) is not None
+
+    for path in (paths[0], paths[1], paths[0]):    # The second read of paths[0] is a hit, making paths[1] the oldest
+        mirror.read(path)
+        time.sleep(0.05)    # File timestamps are only as fine grained as the kernel clock tick
+    assert server.count("RETR") == 2
+    mirror.read(paths[2])
+    assert cached(paths[0]) and cached(paths[2])
+    assert not cached(paths[1])
+
+
+def test_failed_transfer_is_not_committed(server, tmp_path):
+    cache = MirrorCache(str(tmp_path))
+    server.drops = [120_000]
+    with pytest.raises(all_errors):
+        cached_mirror(server, cache, retries=0).read(CONTENTS)
+    mirror = cached_mirror(server, cache)
+    assert mirror.cached_checksum(CONTENTS) is None
+    assert cache.lookup(server.host, CONTENTS, mirror.stat(CONTENTS)) is None
+
+    # The partial copy is kept, so the next read only fetches the rest, and that completed copy is committed
+    assert mirror.read(CONTENTS) == FILES[CONTENTS]
+    assert "REST 120000" in server.commands
+    assert server.bytes_sent[CONTENTS] == len(FILES[CONTENTS])
+    assert mirror.cached_checksum(CONTENTS) is not None
+
+
+@pytest.mark.parametrize("first_commits_first", [True, False])
+def test_overlapping_stores_keep_separate_partial_files(tmp_path, first_commits_first):
+    cache = MirrorCache(str(tmp_path))
+    data = FILES[CONTENTS]
+    validator = f"{len(data)}:20230101000000"
+    with pytest.raises(RuntimeError):
+        with cache.store("mirror", CONTENTS, validator) as interrupted:
+            interrupted.write(data[:50_000])
+            raise RuntimeError("connection dropped")
+
+    first, second = cache.store("mirror", CONTENTS, validator), cache.store("mirror", CONTENTS, validator)
+    first_file = first.__enter__()
+    second_file = second.__enter__()
+    assert first_file.tell() == 50_000     # Resumes the interrupted download
+    assert second_file.tell() == 0         # Can't share the locked partial file, so starts over in its own
+    first_file.write(data[50_000:])
+    second_file.write(data)
+    for store in (first, second) if first_commits_first else (second, first):
+        store.__exit__(None, None, None)
+
+    cached_path = cache.lookup("mirror", CONTENTS, validator)
+    with open(cached_path, 'rb') as f:
+        assert f.read() == data
+    assert cache.checksum("mirror", CONTENTS, validator) == sha256(data).hexdigest()
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_failed_overlapping_store_discards_its_partial_file(tmp_path):
+    cache = MirrorCache(str(tmp_path))
+    data = FILES[CONTENTS]
+    validator = f"{len(data)}:20230101000000"
+    with cache.store("mirror", CONTENTS, validator) as first:
+        first.write(data[:50_000])
+        with pytest.raises(RuntimeError):
+            with cache.store("mirror", CONTENTS, validator) as second:
+                second.write(data[:10_000])
+                raise RuntimeError("connection dropped")
+        assert [str(path) for path in tmp_path.glob("*.part")] == [f"{cache._entry_path('mirror', CONTENTS)}.part"]
+        first.write(data[50_000:])
+    with open(cache.lookup("mirror", CONTENTS, validator), 'rb') as f:
+        assert f.read() == data
+
+
+def run_with_timeout(function, seconds: float = 10):
+    """Run `function` on a thread, failing the test if it hasn't finished within `seconds`. Returns what it raised"""
+    raised = []
+
+    def target():
+        try:
+            function()
+        except BaseException as e:
+            raised.append(e)
+    thread = Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    assert not thread.is_alive(), "timed out"
+    return raised[0] if raised else None
+
+
+def test_pool_gives_back_slots_of_failed_connections(monkeypatch):
+    with socket.create_server(("127.0.0.1", 0)) as unused:
+        closed_port = unused.getsockname()[1]
+    monkeypatch.setattr(ftplib.FTP, "port", closed_port)
+    pool = MirrorPool("127.0.0.1", 1)
+    error = run_with_timeout(lambda: count_all_contents(pool, {"amd64": CONTENTS, "i386": CONTENTS}))
+    assert isinstance(error, OSError)
+    assert pool._opened == 0
+
+
+def test_pool_discards_connection_after_error(server):
+    pool = MirrorPool(server.host, 1)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as broken:
+            raise RuntimeError("failed mid-transfer")
+    assert broken.ftp.sock is None     # Closed rather than handed to the next borrower
+    with pool.connection() as mirror:
+        assert mirror is not broken
+        assert mirror.read(CONTENTS) == FILES[CONTENTS]
+    assert pool._opened == 1
+
+
+def test_pool_wakes_waiter_when_connection_is_discarded(server):
+    pool = MirrorPool(server.host, 1)
+    borrowed = Event()
+    got = []
+
+    def wait_for_connection():
+        borrowed.wait()
+        with pool.connection() as mirror:
+            got.append(mirror.read(CONTENTS))
+
+    waiter = Thread(target=wait_for_connection, daemon=True)
+    waiter.start()
+    with pytest.raises(RuntimeError):
+        with pool.connection():
+            borrowed.set()
+            time.sleep(0.1)     # Let the waiter block on the pool
+            raise RuntimeError("failed mid-transfer")
+    waiter.join(10)
+    assert got == [FILES[CONTENTS]]
+
+
+def content_index(lines: int = 3_000) -> bytes:
+    """A decompressed content index with a blank line, an invalid line and an unterminated last line among valid ones"""
+    rand = Random(2)
+    entries = [
+        f"usr/share/doc/file-{i}{'x' * rand.randrange(40)}   "
+        f"{','.join(f'section/pkg-{rand.randrange(50)}' for _ in range(rand.randint(1, 3)))}"
+        for i in range(lines)
+    ]
+    entries[700] = ""
+    entries[1_900] = "no-package-column"
+    return "\n".join(entries).encode('utf-8')
+
+
+@pytest.mark.parametrize("fast", [False, True])
+@pytest.mark.parametrize("workers", [2, 3, 7])
+def test_sharded_count_matches_single_process(tmp_path, fast, workers):
+    index = content_index()
+    # The shard boundaries are only moved to line ends if they start out inside a line
+    assert any(index[len(index) * i // workers - 1] != ord("\n") for i in range(1, workers))
+    path = tmp_path / "Contents"
+    path.write_bytes(index)
+
+    def count(workers: int) -> tuple[PackageCounter, list[int]]:
+        invalid_lines = []
+        return count_index_file(str(path), workers, fast, invalid_lines.append), invalid_lines
+
+    (single, single_invalid), (sharded, sharded_invalid) = count(1), count(workers)
+    streamed_invalid = []
+    streamed = PackageCounter(fast, streamed_invalid.append)
+    streamed.feed(index)
+    streamed.close()
+    assert single_invalid == sharded_invalid == streamed_invalid == [700, 1_900]
+    assert single.package_count == sharded.package_count == streamed.package_count
+    assert single.most_common() == sharded.most_common() == streamed.most_common()
+    assert single.line_count == sharded.line_count == 3_000
+
+
+@pytest.mark.parametrize("argv", [["amd64", "--async-ftp"], ["--all-archs", "--async-ftp", "--workers", "2"]])
+def test_async_ftp_rejects_unsupported_options(monkeypatch, argv):
+    monkeypatch.setattr(sys, "argv", ["package_statistics.py", *argv])
+    with pytest.raises(SystemExit):
+        parse_args()
+
+
+def test_async_ftp_with_all_archs(monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["package_statistics.py", "--all-archs", "--async-ftp", "-c", "8"])
+    args = parse_args()
+    assert args.async_ftp and args.all_archs and args.connections == 8
+
+
+def test_indexed_count_stats_once_and_reuses_the_index(server, tmp_path):
+    index = content_index()
+    server.files[CONTENTS] = gzip.compress(index)
+    expected = PackageCounter()
+    expected.feed(index)
+    expected.close()
+    cache = MirrorCache(str(tmp_path))
+
+    for reused in (False, True):
+        sizes_before = server.count("SIZE")
+        with count_contents_indexed(cached_mirror(server, cache), CONTENTS, on_invalid_line=lambda line_no: None) as counts:
+            assert isinstance(counts, PackageIndex) == reused
+            assert counts.most_common() == expected.most_common()
+        assert server.count("SIZE") == sizes_before + 1
+    assert server.count("RETR") == 1
+    assert counts._data.closed
@@ -0,0 +1,145 @@
+# Probe Length Benchmark for the Hash Tables
+
+from argparse import ArgumentParser
+from collections import Counter
+from random import Random
+from time import perf_counter
+import string
+
+import linear_probing
+import quadratic_probing
+import double_hashing
+import robin_hood
+from hash_functions import first_letter_hash, next_prime, polynomial_hash
+
+
+TABLES = {
+    "linear probing": linear_probing.hashTable,
+    "quadratic probing": quadratic_probing.hashTable,
+    "double hashing": double_hashing.hashTable,
+    "robin hood": robin_hood.RobinHoodHashTable,
+}
+
+
+def random_keys(n, seed=0):
+    """
+    n distinct random alphabetic keys, 3 to 12 characters long.
+    """
+    rand = Random(seed)
+    keys = set()
+    while len(keys) < n:
+        keys.add("".join(rand.choices(string.ascii_letters, k=rand.randint(3, 12))))
+    return list(keys)
+
+
+def histogram_summary(histogram):
+    """
+    Mean, 99th percentile and longest probe from a Counter of probe lengths.
+    """
+    total = sum(histogram.values())
+    mean = sum(length * n for length, n in histogram.items()) / total
+    seen = 0
+    for length in sorted(histogram):
+        seen += histogram[length]
+        if seen >= 0.99 * total:
+            return mean, length, max(histogram)
+
+
+def histogram_bars(histogram, width=40):
+    """
+    Render probe lengths in power of two buckets (0, 1, 2-3, 4-7, ...) as a text bar chart.
+    """
+    buckets = Counter()
+    for length, n in histogram.items():
+        buckets[length.bit_length()] += n
+    total = sum(buckets.values())
+    lines = []
+    for bucket in range(max(buckets) + 1):
+        low = 0 if bucket == 0 else 1 << (bucket - 1)
+        high = 0 if bucket == 0 else (1 << bucket) - 1
+        label = str(low) if low == high else "%d-%d" % (low, high)
+        share = buckets[bucket] / total
+        lines.append("      %12s | %-*s %6.2f%%" % (label, width, "#" * round(share * width), share * 100))
+    return "\n".join(lines)
+
+
+def measure(table_class, keys, **table_args):
+    """
+    Insert every key, then look each one up again, with stats enabled throughout.
+    """
+    table = table_class(**table_args)
+    table.enable_stats()
+    start = perf_counter()
+    for key in keys:
+        table.insert(key)
+    insert_time = perf_counter() - start
+
+    start = perf_counter()
+    for key in keys:
+        table.probe(key)
+    lookup_time = perf_counter() - start
+    return table, insert_time, lookup_time
+
+
+def report(name, keys, **table_args):
+    for table_name, table_class in TABLES.items():
+        table, insert_time, lookup_time = measure(table_class, keys, **table_args)
+        stats = table.stats()
+        probes = stats["hit_probes"] + stats["miss_probes"]     # Misses are keys a full fixed size table refused
+        mean, p99, longest = histogram_summary(probes)
+        print("  %s, %s: %d keys in %d slots (load %.2f)"
+              % (table_name, name, len(table), table.table_max_size, stats["load_factor"]))
+        print("    insert %.0f/s, lookup %.0f/s, probe length mean %.2f, p99 %d, max %d"
+              % (len(keys) / insert_time, len(keys) / lookup_time, mean, p99, longest))
+        print("    longest cluster %d, %d resizes taking %.3fs (longest %.3fs)"
+              % (stats["longest_cluster"], stats["resize_count"], stats["resize_seconds"], stats["max_resize_seconds"]))
+        print(histogram_bars(probes))
+        print()
+
+
+def report_high_load(keys, load_factor):
+    """
+    Fill fixed size tables to load_factor, then compare the probe lengths of lookups that hit and that miss.
+    """
+    table_size = next_prime(int(len(keys) / load_factor))
+    present = set(keys)
+    missing = [key for key in random_keys(len(keys), seed=1) if key not in present]
+    for table_name, table_class in TABLES.items():
+        table = table_class(table_size=table_size, load_factor=None)
+        refused = sum(not table.insert(key) for key in keys)
+        table.enable_stats()
+        for key in keys + missing:
+            table.probe(key)
+        stats = table.stats()
+        summaries = histogram_summary(stats["hit_probes"]) + histogram_summary(stats["miss_probes"])
+        print("  %s: %d keys in %d slots (load %.2f), %d inserts refused, longest cluster %d"
+              % (table_name, len(table), table.table_max_size, stats["load_factor"], refused, stats["longest_cluster"]))
+        print("    hits:   probe length mean %6.2f, p99 %5d, max %5d\n"
+              "    misses: probe length mean %6.2f, p99 %5d, max %5d" % tuple(summaries))
+    print()
+
+
+def parse_args():
+    parser = ArgumentParser(description="Compare probe lengths across hash functions, probing schemes and load factors")
+    parser.add_argument("-n", "--keys", default=200000, type=int,
+                        help="Keys inserted into the growing polynomial hash tables. Defaults to 200000")
+    parser.add_argument("-b", "--before-keys", default=5000, type=int,
+                        help="Keys inserted into the fixed size first letter hash tables, which probe in O(n) "
+                             "so are kept smaller. Defaults to 5000")
+    parser.add_argument("-l", "--load", default=0.9, type=float,
+                        help="Load factor to fill fixed size tables to when comparing hits and misses. Defaults to 0.9")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    print("Before: first letter hash, fixed size table")
+    report("first letter hash", random_keys(args.before_keys), table_size=next_prime(2 * args.before_keys),
+           load_factor=None, hash_function=first_letter_hash)
+
+    print("After: polynomial hash, growing table")
+    report("polynomial hash", random_keys(args.keys), hash_function=polynomial_hash)
+
+    print("Fixed size tables at load factor %.2f, polynomial hash" % args.load)
+    report_high_load(random_keys(args.keys), args.load)
@@ -0,0 +1,78 @@
+# Bulk Loading and Batched Lookup Benchmark
+
+from argparse import ArgumentParser
+from time import perf_counter
+
+import linear_probing
+from rehash import HashTableLinear
+from hash_functions import polynomial_hash, polynomial_hash_value, table_size_for
+
+
+def timed(function, *args, **kwargs):
+    start = perf_counter()
+    result = function(*args, **kwargs)
+    return result, perf_counter() - start
+
+
+def insert_each(keys):
+    table = linear_probing.hashTable()
+    for key in keys:
+        table.insert(key)
+    return table
+
+
+def lookup_each(table, keys):
+    return [key in table for key in keys]
+
+
+def set_each(items):
+    table = HashTableLinear()
+    for key, value in items:
+        table[key] = value
+    return table
+
+
+def get_each(table, keys):
+    return [table.get(key) for key in keys]
+
+
+def report(name, n, seconds, hashing_seconds):
+    print("    %-32s %7.2fs  %6.2fus per key  (%3.0f%% hashing)" % (name, seconds, seconds / n * 1e6, 100 * hashing_seconds / seconds))
+
+
+def parse_args():
+    parser = ArgumentParser(description="Compare one-at-a-time loading and lookups against the bulk and batched APIs")
+    parser.add_argument("-n", "--keys", default=1000000, type=int, help="Keys to load. Defaults to 1000000")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    n = args.keys
+    keys = ["key-%d" % i for i in range(n)]
+    items = [(key, i) for i, key in enumerate(keys)]
+
+    print("hashTable (linear probing), %d keys" % n)
+    size = table_size_for(n, 0.7)
+    _, hashing = timed(lambda: [polynomial_hash(key, size) for key in keys])
+    print("    %-32s %7.2fs" % ("hashing alone", hashing))
+    table, seconds = timed(insert_each, keys)
+    report("insert one at a time", n, seconds, hashing)
+    table, seconds = timed(linear_probing.hashTable.from_iterable, keys)
+    report("from_iterable", n, seconds, hashing)
+    _, seconds = timed(lookup_each, table, keys)
+    report("in, one at a time", n, seconds, hashing)
+    _, seconds = timed(table.contains_many, keys)
+    report("contains_many", n, seconds, hashing)
+
+    print("HashTableLinear, %d items" % n)
+    _, hashing = timed(lambda: [polynomial_hash_value(key) for key in keys])
+    print("    %-32s %7.2fs" % ("hashing alone", hashing))
+    table, seconds = timed(set_each, items)
+    report("__setitem__ one at a time", n, seconds, hashing)
+    table, seconds = timed(HashTableLinear.from_iterable, items)
+    report("from_iterable", n, seconds, hashing)
+    _, seconds = timed(get_each, table, keys)
+    report("get, one at a time", n, seconds, hashing)
+    _, seconds = timed(table.get_many, keys)
+    report("get_many", n, seconds, hashing)
@@ -0,0 +1,94 @@
+# Probe Benchmark for Double Hashing: the Original Probe Sequence Against the Fixed One
+
+from argparse import ArgumentParser
+
+import double_hashing
+from benchmark import histogram_summary, random_keys
+from hash_functions import next_prime
+
+
+class OriginalProbe(double_hashing.hashTable):
+    """
+    The probe sequence as it was: each step is hash2 of the current slot index (by its first digit), added to the
+    home slot rather than accumulated, so a key only ever visits a handful of distinct slots.
+    """
+    def hash2(self, input_string):
+        return ord(str(input_string)[0]) % (self.table_max_size - 1) + 1
+
+    def probe(self, val, find=True):
+        key = self.hash_value(val)
+        keyInitial = key
+        count = 0
+        while (self.array[key] is not None) and (self.array[key] != val):
+            count += 1
+            if count == self.table_max_size:
+                return None
+            key = (keyInitial + self.hash2(key)) % self.table_max_size
+        if find and self.instrumentation is not None:
+            self.instrumentation.record_probe(count, self.array[key] is not None)
+        return key
+
+
+class FirstLetterStep(double_hashing.hashTable):
+    """
+    The fixed probe sequence, but with the original hash2: every key sharing a first letter shares a step.
+    """
+    def hash2(self, input_string):
+        return ord(str(input_string)[0]) % (self.table_max_size - 1) + 1
+
+
+TABLES = {
+    "original probe": OriginalProbe,
+    "i*step, first letter step": FirstLetterStep,
+    "i*step, polynomial step": double_hashing.hashTable,
+}
+
+
+def prefixed_keys(n):
+    """
+    n keys sharing a common prefix, like most real key sets (ids, paths, usernames): one first letter for all of them.
+    """
+    return ["user-%d" % i for i in range(n)]
+
+
+KEY_SETS = {
+    "random keys": random_keys,
+    "prefixed keys": prefixed_keys,
+}
+
+
+def fill(table_class, keys, table_size):
+    """
+    Insert keys into a fixed size table, returning it and how many inserts it refused.
+    Its stats then hold the probe lengths of looking every key up again.
+    """
+    table = table_class(table_size=table_size, load_factor=None)
+    refused = sum(not table.insert(key) for key in keys)
+    table.enable_stats()
+    for key in keys:
+        table.probe(key)
+    return table, refused
+
+
+def parse_args():
+    parser = ArgumentParser(description="Compare double hashing probe sequences on fixed size tables")
+    parser.add_argument("-s", "--size", default=5003, type=int, help="Table size (rounded up to a prime). Defaults to 5003")
+    parser.add_argument("-l", "--loads", default=[0.5, 0.7, 0.9, 0.99], type=float, nargs="+",
+                        help="Load factors to fill the table to. Defaults to 0.5 0.7 0.9 0.99")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    size = next_prime(args.size)
+    for load in args.loads:
+        for key_set, make_keys in KEY_SETS.items():
+            keys = make_keys(int(load * size))
+            print("Filling %d slots with %d %s (load %.2f)" % (size, len(keys), key_set, load))
+            for name, table_class in TABLES.items():
+                table, refused = fill(table_class, keys, size)
+                stats = table.stats()
+                mean, p99, longest = histogram_summary(stats["hit_probes"] + stats["miss_probes"])
+                print("  %-28s %5d inserts refused, stored key lookups probe mean %6.2f, p99 %5d, max %5d"
+                      % (name, refused, mean, p99, longest))
+            print()
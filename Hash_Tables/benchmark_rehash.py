@@ -0,0 +1,54 @@
+# Insert Latency Benchmark for HashTableLinear, With and Without Incremental Rehashing
+
+from argparse import ArgumentParser
+from time import perf_counter, perf_counter_ns
+
+from rehash import HashTableLinear
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def insert_latencies(keys, **table_args):
+    """
+    Insert every key into a new HashTableLinear, timing each insert individually (in nanoseconds).
+    """
+    table = HashTableLinear(**table_args)
+    latencies = []
+    record = latencies.append
+    clock = perf_counter_ns
+    for key in keys:
+        start = clock()
+        table[key] = None
+        record(clock() - start)
+    return table, latencies
+
+
+def report(name, keys, **table_args):
+    start = perf_counter()
+    table, latencies = insert_latencies(keys, **table_args)
+    elapsed = perf_counter() - start
+    latencies.sort()
+    print("  %s: %d keys into %d slots, %.0f inserts/s" % (name, len(table), table.table_max_size, len(keys) / elapsed))
+    print("    p50 %8.1fus   p99 %8.1fus   p99.99 %10.1fus   max %12.1fus"
+          % tuple(value / 1000 for value in (
+              percentile(latencies, 0.5), percentile(latencies, 0.99), percentile(latencies, 0.9999), latencies[-1]
+          )))
+
+
+def parse_args():
+    parser = ArgumentParser(description="Compare HashTableLinear insert latency with stop-the-world and incremental rehashing")
+    parser.add_argument("-n", "--keys", default=2000000, type=int,
+                        help="Keys to insert. The default of 2000000 grows the table through every size up to 6584983")
+    parser.add_argument("-s", "--migrate-step", default=8, type=int,
+                        help="The fewest old slots migrated per operation in incremental mode. Defaults to 8")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    keys = [str(i) for i in range(args.keys)]
+    print("Insert latency over %d inserts" % args.keys)
+    report("stop-the-world rehash", keys)
+    report("incremental rehash (step %d)" % args.migrate_step, keys, incremental=True, migrate_step=args.migrate_step)
@@ -0,0 +1,118 @@
+# Memory and Lookup Benchmark for HashTableLinear's Storage
+
+from argparse import ArgumentParser
+from time import perf_counter
+import tracemalloc
+
+from hash_functions import polynomial_hash, next_prime
+from referential_array import build_array
+from rehash import HashTableLinear
+
+
+class TupleSlotTable:
+    """
+    HashTableLinear's storage as it was before the parallel arrays, as a baseline: a (key, value) tuple per slot of a
+    ctypes array from build_array, with the key rehashed on every probe and on every resize. Only inserting and
+    membership tests are kept, which is all this benchmark times.
+    """
+
+    def __init__(self, load_factor=0.5):
+        self.count = 0
+        self.size_index = 0
+        self.a = 31
+        self.load_factor = load_factor
+        self.table_max_size = HashTableLinear.prime_list[self.size_index]
+        self.array = build_array(self.table_max_size)
+
+    def __setitem__(self, key, value):
+        if self.count + 1 > self.load_factor * self.table_max_size:
+            self.__rehash__()
+        position = self.probe(key)
+        if self.array[position] is None:
+            self.count += 1
+        self.array[position] = (key, value)
+
+    def __contains__(self, key):
+        return self.array[self.probe(key)] is not None
+
+    def __len__(self):
+        return self.count
+
+    def probe(self, key):
+        position = polynomial_hash(key, self.table_max_size, self.a)
+        while self.array[position] is not None and self.array[position][0] != key:
+            position = (position+1) % self.table_max_size
+        return position
+
+    def __rehash__(self):
+        temp = self.array
+        self.size_index += 1
+        if self.size_index < len(HashTableLinear.prime_list):
+            self.table_max_size = HashTableLinear.prime_list[self.size_index]
+        else:
+            self.table_max_size = next_prime(2 * self.table_max_size)
+        self.array = build_array(self.table_max_size)
+        for item in temp:
+            if item is not None:
+                self.array[self.probe(item[0])] = item
+
+
+LAYOUTS = {
+    "tuple per slot": TupleSlotTable,
+    "parallel arrays": HashTableLinear,
+}
+
+
+def build_table(table_class, keys):
+    """
+    Fill a table_class with keys, returning it along with the seconds it took.
+    """
+    start = perf_counter()
+    table = table_class()
+    for key in keys:
+        table[key] = None
+    return table, perf_counter() - start
+
+
+def table_bytes(table_class, keys):
+    """
+    Bytes taken by the storage of a table_class filled with keys (excluding the keys themselves).
+    """
+    tracemalloc.start()
+    table, _ = build_table(table_class, keys)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current
+
+
+def time_lookups(table, keys):
+    """
+    Seconds taken to look up every key (a membership test, so hits and misses are timed alike).
+    """
+    start = perf_counter()
+    for key in keys:
+        key in table
+    return perf_counter() - start
+
+
+def parse_args():
+    parser = ArgumentParser(description="Compare memory per entry and lookup time of HashTableLinear's storage layouts")
+    parser.add_argument("-n", "--keys", default=1000000, type=int, help="Keys to insert. Defaults to 1000000")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    keys = ["key-%d" % i for i in range(args.keys)]
+    missing = ["missing-%d" % i for i in range(args.keys)]
+
+    print("%-16s %10s %10s %12s %12s %12s" % ("layout", "slots", "bytes/key", "insert us", "hit us", "miss us"))
+    for name, table_class in LAYOUTS.items():
+        memory = table_bytes(table_class, keys)
+        table, insert_time = build_table(table_class, keys)
+        if len(table) != args.keys:
+            print("[!] %s holds %d of %d keys" % (name, len(table), args.keys))
+        print("%-16s %10d %10.1f %12.2f %12.2f %12.2f" % (
+            name, table.table_max_size, memory / len(table), insert_time / args.keys * 1e6,
+            time_lookups(table, keys) / args.keys * 1e6, time_lookups(table, missing) / args.keys * 1e6))
+        del table
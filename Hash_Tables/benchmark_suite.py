@@ -0,0 +1,198 @@
+# Benchmark Suite Comparing Every Hash Table Strategy (and dict) Across Key Distributions
+
+from argparse import ArgumentParser
+from random import Random
+from time import perf_counter
+import json
+import platform
+import tracemalloc
+
+import linear_probing
+import quadratic_probing
+import double_hashing
+import robin_hood
+from rehash import HashTableLinear
+from benchmark import histogram_summary, random_keys
+
+
+def set_insert(table, key):
+    table.insert(key)
+
+
+def map_insert(table, key):
+    table[key] = None
+
+
+STRATEGIES = {
+    "linear probing": (linear_probing.hashTable, set_insert),
+    "quadratic probing": (quadratic_probing.hashTable, set_insert),
+    "double hashing": (double_hashing.hashTable, set_insert),
+    "robin hood": (robin_hood.RobinHoodHashTable, set_insert),
+    "HashTableLinear": (HashTableLinear, map_insert),
+    "dict": (dict, map_insert),
+}
+
+
+def prefixed_keys(n, seed=0):
+    """
+    n distinct keys sharing a long common prefix, like ids or paths: every one has the same first character.
+    """
+    rand = Random(seed)
+    return ["/srv/users/account-%d" % i for i in rand.sample(range(10 * n), n)]
+
+
+def integer_keys(n, seed=0):
+    """
+    n distinct random integers below 2**40.
+    """
+    return Random(seed).sample(range(1 << 40), n)
+
+
+KEY_TYPES = {
+    "uniform": random_keys,
+    "prefixed": prefixed_keys,
+    "integer": integer_keys,
+}
+
+
+def key_sets(key_type, n):
+    """
+    n keys to insert and n more, none of them among the first, to look up as misses.
+    """
+    keys = KEY_TYPES[key_type](2 * n)
+    return keys[:n], keys[n:]
+
+
+def time_ops(table_class, insert, keys, missing):
+    """
+    Build a table from keys, look up every key and every missing key, then delete half the keys.
+    Returns the seconds each of those four phases took.
+    """
+    table = table_class()
+    start = perf_counter()
+    for key in keys:
+        insert(table, key)
+    inserted = perf_counter()
+    for key in keys:
+        key in table
+    hits = perf_counter()
+    for key in missing:
+        key in table
+    misses = perf_counter()
+    for key in keys[::2]:
+        del table[key]
+    deleted = perf_counter()
+    return inserted - start, hits - inserted, misses - hits, deleted - misses
+
+
+def table_bytes(table_class, insert, keys):
+    """
+    Bytes allocated by a table holding keys, excluding the keys themselves.
+    """
+    tracemalloc.start()
+    table = table_class()
+    for key in keys:
+        insert(table, key)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current
+
+
+def probe_stats(table_class, insert, keys, missing):
+    """
+    The probe and resize stats of building a table from keys, then looking up every key and every missing key.
+    None for tables without instrumentation (dict).
+    """
+    table = table_class()
+    if not hasattr(table, "enable_stats"):
+        return None
+    table.enable_stats()
+    for key in keys:
+        insert(table, key)
+    for key in keys:
+        key in table
+    for key in missing:
+        key in table
+    stats = table.stats()
+    hit_mean, hit_p99, hit_max = histogram_summary(stats["hit_probes"])
+    miss_mean, miss_p99, miss_max = histogram_summary(stats["miss_probes"])
+    return {
+        "size": stats["size"],
+        "load_factor": stats["load_factor"],
+        "longest_cluster": stats["longest_cluster"],
+        "hit_probe_mean": hit_mean,
+        "hit_probe_p99": hit_p99,
+        "hit_probe_max": hit_max,
+        "miss_probe_mean": miss_mean,
+        "miss_probe_p99": miss_p99,
+        "miss_probe_max": miss_max,
+        "resize_count": stats["resize_count"],
+        "resize_seconds": stats["resize_seconds"],
+        "max_resize_seconds": stats["max_resize_seconds"],
+    }
+
+
+def run(strategy, key_type, keys, missing, repeats):
+    """
+    Benchmark one strategy on one key set, taking the fastest of repeats runs for each phase.
+    """
+    table_class, insert = STRATEGIES[strategy]
+    timings = [time_ops(table_class, insert, keys, missing) for _ in range(repeats)]
+    insert_time, hit_time, miss_time, delete_time = (min(phase) for phase in zip(*timings))
+    n = len(keys)
+    return {
+        "strategy": strategy,
+        "key_type": key_type,
+        "keys": n,
+        "insert_ops": n / insert_time,
+        "hit_ops": n / hit_time,
+        "miss_ops": len(missing) / miss_time,
+        "delete_ops": len(keys[::2]) / delete_time,
+        "bytes_per_key": table_bytes(table_class, insert, keys) / n,
+        "probes": probe_stats(table_class, insert, keys, missing),
+    }
+
+
+def report(result):
+    print("  %-18s insert %9.0f/s  hit %9.0f/s  miss %9.0f/s  delete %9.0f/s  %7.1f bytes/key"
+          % (result["strategy"], result["insert_ops"], result["hit_ops"], result["miss_ops"],
+             result["delete_ops"], result["bytes_per_key"]))
+    probes = result["probes"]
+    if probes is not None:
+        print("  %-18s load %.2f, longest cluster %d, hit probes mean %.2f p99 %d max %d, "
+              "miss probes mean %.2f p99 %d max %d, %d resizes %.3fs"
+              % ("", probes["load_factor"], probes["longest_cluster"],
+                 probes["hit_probe_mean"], probes["hit_probe_p99"], probes["hit_probe_max"],
+                 probes["miss_probe_mean"], probes["miss_probe_p99"], probes["miss_probe_max"],
+                 probes["resize_count"], probes["resize_seconds"]))
+
+
+def parse_args():
+    parser = ArgumentParser(description="Benchmark every hash table strategy, and dict, over several key distributions")
+    parser.add_argument("-n", "--keys", default=100000, type=int, help="Keys inserted into each table. Defaults to 100000")
+    parser.add_argument("-r", "--repeats", default=3, type=int,
+                        help="Runs of each timing, of which the fastest is reported. Defaults to 3")
+    parser.add_argument("-s", "--strategies", default=list(STRATEGIES), choices=list(STRATEGIES), nargs="+",
+                        metavar="STRATEGY", help="Strategies to run (quote names with spaces). Defaults to all of them")
+    parser.add_argument("-k", "--key-types", default=list(KEY_TYPES), choices=list(KEY_TYPES), nargs="+",
+                        help="Key distributions to run. Defaults to all of them")
+    parser.add_argument("-o", "--json", help="Also write the results to this JSON file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = []
+    for key_type in args.key_types:
+        keys, missing = key_sets(key_type, args.keys)
+        print("%s keys, %d inserted, %d missing" % (key_type, len(keys), len(missing)))
+        for strategy in args.strategies:
+            result = run(strategy, key_type, keys, missing, args.repeats)
+            report(result)
+            results.append(result)
+        print()
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump({"python": platform.python_version(), "keys": args.keys, "repeats": args.repeats,
+                       "results": results}, output, indent=2)
@@ -0,0 +1,71 @@
+# Hash Functions and Table Sizing Shared by the Hash Tables
+
+from math import ceil
+
+
+WORD_MASK = (1 << 64) - 1
+GOLDEN_RATIO_64 = 0x9E3779B97F4A7C15    # 2**64 / golden ratio, the multiplier for Fibonacci hashing
+
+
+def polynomial_hash(input_string, table_size, a=31):
+    """
+    Polynomial rolling hash over every character of the key, reduced to a slot.
+    Args:
+        input_string: The key to hash. Non-string keys are hashed by their str().
+        table_size (int): Number of slots in the table.
+        a (int): The polynomial base.
+    Returns:
+        The home slot of the key, in [0, table_size).
+    """
+    return polynomial_hash_value(input_string, a) % table_size
+
+
+def polynomial_hash_value(input_string, a=31):
+    """
+    The full polynomial hash of a key, evaluated with Horner's rule in 64 bits, before it is reduced to a slot.
+    It is scrambled by Fibonacci hashing, since the polynomial of a short key is smaller than a large table and would
+    otherwise only ever land in its first few slots. The top bit is dropped so it can be cached in a signed 64 bit array.
+    """
+    value = 0
+    for char in str(input_string):
+        value = (value * a + ord(char)) & WORD_MASK
+    return (value * GOLDEN_RATIO_64 & WORD_MASK) >> 1
+
+
+def first_letter_hash(input_string, table_size):
+    """
+    The original hash, kept for comparison: every key sharing a first letter shares a slot.
+    """
+    return ord(str(input_string)[0]) % table_size
+
+
+def is_prime(n):
+    if n < 2:
+        return False
+    if n % 2 == 0:
+        return n == 2
+    divisor = 3
+    while divisor * divisor <= n:
+        if n % divisor == 0:
+            return False
+        divisor += 2
+    return True
+
+
+def next_prime(n):
+    """
+    The smallest prime greater than or equal to n, used to size grown tables.
+    """
+    while not is_prime(n):
+        n += 1
+    return n
+
+
+def table_size_for(expected_size, load_factor, minimum=11):
+    """
+    The smallest prime table size that holds expected_size items without passing load_factor
+    (or without filling up, if load_factor is None).
+    """
+    if load_factor is None:
+        return next_prime(max(expected_size, minimum))
+    return next_prime(max(ceil(expected_size / load_factor), minimum))
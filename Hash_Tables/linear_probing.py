@@ -2,22 +2,39 @@
 # Linear Probing Hash Function
 
 
+from time import perf_counter
+
 from referential_array import build_array
+from hash_functions import polynomial_hash, next_prime, table_size_for
+from table_stats import TableStats
+
+TOMBSTONE = object()    # Left in the slot of a deleted item, so probes for items further along its sequence carry on past it
 
 
 class hashTable:
 
-    def __init__(self, table_size=11):
+    def __init__(self, table_size=11, load_factor=0.7, hash_function=polynomial_hash):
+        """
+        Args:
+            table_size (int): Initial number of slots.
+            load_factor (float): Grow the table once inserting would fill more than this fraction of it.
+                None keeps the table at a fixed size, refusing inserts once it is full.
+            hash_function: Called as hash_function(key, table_size) to find a key's home slot.
+        """
         self.array = build_array(table_size)
         self.table_max_size = table_size
         self.count = 0
+        self.tombstones = 0
+        self.load_factor = load_factor
+        self.hash_function = hash_function
+        self.instrumentation = None     # A TableStats while enable_stats() is in effect
 
     # -----------------------------------------------------------------------
 
     def __str__(self):
         string = ""
         for index in range(self.table_max_size):
-            if self.array[index] is None:
+            if self.array[index] is None or self.array[index] is TOMBSTONE:
                 pass
             else:
                 string += str((index, str(self.array[index])))
@@ -29,7 +46,7 @@ class hashTable:
     def __getitem__(self, val):
         item = self.probe(val)
 
-        if item is None:
+        if item is None or self.array[item] is None:
             raise KeyError(str(val)+" not found")
         return item
 
@@ -37,18 +54,148 @@ class hashTable:
 
     def __contains__(self, key):
         item = self.probe(key)
-        if item is None:
+        if item is None or self.array[item] is None:
             return False
         return True
 
     # -----------------------------------------------------------------------
 
+    def __delitem__(self, val):
+        item = self.probe(val)
+
+        if item is None or self.array[item] is None:
+            raise KeyError(str(val)+" not found")
+        self.array[item] = TOMBSTONE
+        self.count -= 1
+        self.tombstones += 1
+
+    # -----------------------------------------------------------------------
+
     def insert(self, val):
+        # Tombstones take up slots like items do, so they count towards the load. Once they make up most of it,
+        # compact the table at its current size rather than growing it
+        if self.load_factor is not None and self.count + self.tombstones + 1 > self.load_factor * self.table_max_size:
+            if self.tombstones > self.count:
+                self.__rehash__(self.table_max_size)
+            else:
+                self.__rehash__()
         pos = self.probe(val, False)
-        if pos is not None:
-            self.array[pos] = val
-            return True
-        return False
+        while pos is None:
+            # The probe sequence ran out of slots to try
+            if self.load_factor is None:
+                return False
+            self.__rehash__()
+            pos = self.probe(val, False)
+        if self.array[pos] is TOMBSTONE:
+            self.tombstones -= 1
+        elif self.array[pos] is not None:
+            return True     # Already present
+        self.array[pos] = val
+        self.count += 1
+        if self.instrumentation is not None:
+            self.instrumentation.record_insert(self.count, self.table_max_size)
+        return True
+
+    # -----------------------------------------------------------------------
+
+    def __rehash__(self, new_size=None):
+        """
+        Move every item into a new array of new_size slots (by default the next prime after double the size),
+        leaving any tombstones behind.
+        """
+        instrumentation, self.instrumentation = self.instrumentation, None     # Moving items isn't inserting them
+        start = perf_counter()
+        old_array = self.array
+        old_size = self.table_max_size
+        self.table_max_size = new_size or next_prime(2 * self.table_max_size)
+        self.array = build_array(self.table_max_size)
+        self.count = 0
+        self.tombstones = 0
+        for item in old_array:
+            if item is not None and item is not TOMBSTONE:
+                self.insert(item)
+        self.instrumentation = instrumentation
+        if instrumentation is not None:
+            instrumentation.record_resize(old_size, self.table_max_size, self.count, perf_counter() - start)
+
+    # -----------------------------------------------------------------------
+
+    @classmethod
+    def from_iterable(cls, vals, expected_size=None, load_factor=0.7, hash_function=polynomial_hash):
+        """
+        Build a table holding every val, sized up front for expected_size of them (by default, however many vals
+        there are) so that loading them never has to grow it.
+        """
+        if expected_size is None:
+            vals = list(vals)
+            expected_size = len(vals)
+        table = cls(table_size_for(expected_size, load_factor), load_factor, hash_function)
+        table.insert_many(vals)
+        return table
+
+    # -----------------------------------------------------------------------
+
+    def insert_many(self, vals):
+        """
+        Insert every val, with the probe inlined into a single loop rather than going through insert for each.
+        Any insert that would pass the load factor (or that the probe sequence can't place) is handed to insert,
+        which grows the table as usual. Tombstones are probed past rather than reused.
+        While stats are enabled every val goes through insert instead, so that each is recorded.
+        """
+        if self.instrumentation is not None:
+            for val in vals:
+                self.insert(val)
+            return
+        hash_function = self.hash_function
+        array, size, count = self.array, self.table_max_size, self.count
+        limit = size if self.load_factor is None else self.load_factor * size
+        limit -= self.tombstones
+        for val in vals:
+            if count + 1 <= limit:
+                key = hash_function(val, size)
+                steps = 0
+                while (array[key] is not None) and (array[key] != val) and steps < size:
+                    steps += 1
+                    key = (key + 1) % size
+                if steps < size:
+                    if array[key] is None:
+                        array[key] = val
+                        count += 1
+                    continue
+
+            self.count = count
+            self.insert(val)
+            array, size, count = self.array, self.table_max_size, self.count
+            limit = size if self.load_factor is None else self.load_factor * size
+            limit -= self.tombstones
+        self.count = count
+
+    # -----------------------------------------------------------------------
+
+    def get_many(self, vals):
+        """
+        The slot of each val (or None for those not in the table), probed in a single loop
+        (or one probe at a time while stats are enabled, so that each is recorded).
+        """
+        if self.instrumentation is not None:
+            slots = [self.probe(val) for val in vals]
+            return [None if slot is None or self.array[slot] is None else slot for slot in slots]
+        hash_function = self.hash_function
+        array, size = self.array, self.table_max_size
+        slots = []
+        for val in vals:
+            key = hash_function(val, size)
+            steps = 0
+            while (array[key] is not None) and (array[key] != val) and steps < size:
+                steps += 1
+                key = (key + 1) % size
+            slots.append(None if steps == size or array[key] is None else key)
+        return slots
+
+    # -----------------------------------------------------------------------
+
+    def contains_many(self, vals):
+        return [slot is not None for slot in self.get_many(vals)]
 
     # -----------------------------------------------------------------------
 
@@ -57,8 +204,30 @@ class hashTable:
 
     # -----------------------------------------------------------------------
 
+    def enable_stats(self, sample_every=1000):
+        """
+        Start recording lookup probe lengths, inserts and resizes (discarding anything recorded before).
+        """
+        self.instrumentation = TableStats(sample_every)
+
+    # -----------------------------------------------------------------------
+
+    def disable_stats(self):
+        self.instrumentation = None
+
+    # -----------------------------------------------------------------------
+
+    def stats(self):
+        """
+        Size, load and longest cluster of the table, along with whatever has been recorded since enable_stats().
+        """
+        instrumentation = self.instrumentation or TableStats()
+        return instrumentation.summary(self.count, self.table_max_size, (item is not None for item in self.array))
+
+    # -----------------------------------------------------------------------
+
     def hash_value(self, input_string):
-        return ord(input_string[0]) % self.table_max_size
+        return self.hash_function(input_string, self.table_max_size)
 
     # -----------------------------------------------------------------------
 
@@ -70,29 +239,39 @@ class hashTable:
             while (self.array[key] is not None) and (self.array[key] != val):
                 count += 1
                 if count == self.table_max_size:
-                    return None
+                    key = None
+                    break
                 key = (key + 1) % self.table_max_size
+            if self.instrumentation is not None:
+                self.instrumentation.record_probe(count, key is not None and self.array[key] is not None)
             return key
         else:
-            while self.array[key] is not None:
+            # val's slot if it is already present, otherwise the first tombstone or empty slot it can be inserted into
+            free = None
+            while (self.array[key] is not None) and (self.array[key] != val):
+                if free is None and self.array[key] is TOMBSTONE:
+                    free = key
                 count += 1
                 if count == self.table_max_size:
-                    return None
+                    return free
                 key = (key + 1) % self.table_max_size
+            if self.array[key] is None and free is not None:
+                return free
             return key
 
     # -----------------------------------------------------------------------
 
 
-input_strings = ["Eva", "Amy", "Tim", "Ron", "Jan", "Kim", "Dot", "Ann", "Jim", "Jon"]
+if __name__ == "__main__":
+    input_strings = ["Eva", "Amy", "Tim", "Ron", "Jan", "Kim", "Dot", "Ann", "Jim", "Jon"]
 
-muh_table = hashTable()
+    muh_table = hashTable()
 
-for string in input_strings:
-    muh_table.insert(string)
+    for string in input_strings:
+        muh_table.insert(string)
 
-print(muh_table)
-print()
-print(muh_table['Jim'])
-print(muh_table['Jon'])
-print(muh_table['Joe'])
+    print(muh_table)
+    print()
+    print(muh_table['Jim'])
+    print(muh_table['Jon'])
+    # print(muh_table['Joe'])
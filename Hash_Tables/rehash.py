@@ -1,50 +1,427 @@
 # MolarFox 2018
 # Building a Rehash Method
 
-from referential_array import build_array
+from array import array
+from math import ceil
+from time import perf_counter
+
+from hash_functions import polynomial_hash_value, next_prime
+from table_stats import TableStats
+
+EMPTY = -1      # Cached hash of an empty slot
+MIGRATED = -2   # Cached hash of an old array slot whose item has moved to the new one, during incremental rehashing
+
+
+def build_slot_list(size):
+    """
+    A list of size empty slots for keys or values. Unlike the ctypes array from build_array, storing into a list
+    slot allocates nothing: ctypes keeps every object stored in a py_object array alive through a dict entry
+    keyed by the str of its index, which costs about 90 bytes per store.
+    """
+    return [None] * size
+
+
+def build_hash_array(size):
+    """
+    An array of size cached hashes, stored unboxed as signed 64 bit ints, with every slot EMPTY.
+    """
+    return array('q', [EMPTY]) * size
+
 
 class HashTableLinear:
+    """
+    Linear probing map, stored as three parallel arrays: keys, values, and each key's cached full hash.
+    A probe compares cached hashes first and only touches a key object when its hash matches, and growing
+    reuses the cached hashes rather than rehashing every key.
+    """
 
     prime_list = [25717, 102877, 205759, 411527,
                  823117, 1646237, 3292489, 6584983,
                  13169977]
 
-    def __init__(self):
+    def __init__(self, load_factor=0.5, incremental=False, migrate_step=8):
+        """
+        Args:
+            load_factor (float): Grow to the next size in prime_list once an insert would fill more than this
+                fraction of the table. Must be below 1, so every probe is guaranteed to reach an empty slot.
+            incremental (bool): Rehash incrementally. Growing only allocates the new arrays, and the old ones are kept
+                alongside them while each later operation moves the next few of their slots across, so no
+                single insert pays for copying the whole table.
+            migrate_step (int): The fewest old slots migrated per operation in incremental mode. Each rehash raises
+                it as far as needed for migration to finish before the inserts left until the next rehash run out
+                (old size / room left before the load factor, which is about 1 / load_factor with prime_list's steps).
+        """
+        if not 0 < load_factor < 1:
+            raise ValueError("Load factor should be between 0 and 1.")
+        if incremental and migrate_step < 1:
+            raise ValueError("Migrate step should be at least 1.")
         self.count = 0
-        size = 0
+        self.size_index = 0
         self.a = 31
-        self.table_max_size = HashTableLinear.prime_list[size]
-        self.array = build_array(self.table_max_size)
+        self.load_factor = load_factor
+        self.table_max_size = HashTableLinear.prime_list[self.size_index]
+        self.keys = build_slot_list(self.table_max_size)
+        self.values = build_slot_list(self.table_max_size)
+        self.hashes = build_hash_array(self.table_max_size)
+
+        self.incremental = incremental
+        self.migrate_step = migrate_step
+        self.migrate_pace = migrate_step    # Old slots migrated per operation for the migration in progress
+        self.old_keys = None    # While migrating: the arrays being moved out of, their size, and the next slot to move
+        self.old_values = None
+        self.old_hashes = None
+        self.old_size = 0
+        self.migrate_index = 0
+        self.instrumentation = None     # A TableStats while enable_stats() is in effect
 
     # -----------------------------------------------------------------------
 
     def __setitem__(self, key, value):
-        position = self.hash_value(key)
-        for _ in range(self.table_max_size):
-            if self.array[position] is None:
-                self.array[position] = (key, value)
+        if self.old_hashes is not None:
+            self.migrate()
+        if self.count + 1 > self.load_factor * self.table_max_size:
+            self.__rehash__()
+        key_hash = self.hash_value(key)
+        position = self.probe(key, key_hash)
+        if self.hashes[position] == EMPTY:
+            old_position = self.probe_old(key, key_hash) if self.old_hashes is not None else None
+            if old_position is None:
                 self.count += 1
-                return
-            elif self.array[position][0] == key:
-                self.array[position] = (key, value)
-                return
+                if self.instrumentation is not None:
+                    self.instrumentation.record_insert(self.count, self.table_max_size)
             else:
-                position = (position+1) % self.table_max_size
+                self.retire_old(old_position)   # The new value supersedes the unmigrated old one
+            self.keys[position] = key
+            self.hashes[position] = key_hash
+        self.values[position] = value
+
+    # -----------------------------------------------------------------------
+
+    def __getitem__(self, key):
+        if self.old_hashes is not None:
+            self.migrate()
+        key_hash = self.hash_value(key)
+        position = self.probe(key, key_hash)
+        if self.instrumentation is not None:
+            self.record_lookup(key, key_hash, position)
+        if self.hashes[position] != EMPTY:
+            return self.values[position]
+        if self.old_hashes is not None:
+            old_position = self.probe_old(key, key_hash)
+            if old_position is not None:
+                return self.old_values[old_position]
+        raise KeyError(str(key)+" not found")
+
+    # -----------------------------------------------------------------------
+
+    def __contains__(self, key):
+        if self.old_hashes is not None:
+            self.migrate()
+        key_hash = self.hash_value(key)
+        position = self.probe(key, key_hash)
+        if self.instrumentation is not None:
+            self.record_lookup(key, key_hash, position)
+        if self.hashes[position] != EMPTY:
+            return True
+        return self.old_hashes is not None and self.probe_old(key, key_hash) is not None
+
+    # -----------------------------------------------------------------------
+
+    def __delitem__(self, key):
+        if self.old_hashes is not None:
+            self.migrate()
+        key_hash = self.hash_value(key)
+        position = self.probe(key, key_hash)
+        if self.instrumentation is not None:
+            self.record_lookup(key, key_hash, position)
+        if self.hashes[position] == EMPTY:
+            old_position = self.probe_old(key, key_hash) if self.old_hashes is not None else None
+            if old_position is None:
+                raise KeyError(str(key)+" not found")
+            self.retire_old(old_position)   # Still lets probes of the old arrays continue past it
+            self.count -= 1
+            return
+        self.clear(position)
+        self.count -= 1
+
+        # Items further along the cluster may have probed past the slot just emptied, so re-insert them
+        position = (position+1) % self.table_max_size
+        while self.hashes[position] != EMPTY:
+            key, value, key_hash = self.keys[position], self.values[position], self.hashes[position]
+            self.clear(position)
+            self.place(key, value, key_hash)
+            position = (position+1) % self.table_max_size
+
+    # -----------------------------------------------------------------------
+
+    @classmethod
+    def from_iterable(cls, items, expected_size=None, load_factor=0.5, incremental=False, migrate_step=8):
+        """
+        Build a table holding every (key, value) pair in items. It starts at the first size in prime_list that holds
+        expected_size items (by default, however many items there are) so that loading them never has to grow it.
+        """
+        if expected_size is None:
+            items = list(items)
+            expected_size = len(items)
+        table = cls(load_factor, incremental, migrate_step)
+        while expected_size > load_factor * table.table_max_size:
+            table.size_index += 1
+            if table.size_index < len(HashTableLinear.prime_list):
+                table.table_max_size = HashTableLinear.prime_list[table.size_index]
+            else:
+                table.table_max_size = next_prime(ceil(expected_size / load_factor))
+        table.keys = build_slot_list(table.table_max_size)
+        table.values = build_slot_list(table.table_max_size)
+        table.hashes = build_hash_array(table.table_max_size)
+        table.update(items)
+        return table
+
+    # -----------------------------------------------------------------------
+
+    def update(self, items):
+        """
+        Set every (key, value) pair in items, with the probe inlined into a single loop rather than going through
+        __setitem__ for each. Any pair that would pass the load factor, or arrives mid-migration, is handed to
+        __setitem__, which grows or migrates as usual. While stats are enabled every pair goes through __setitem__.
+        """
+        if self.instrumentation is not None:
+            for key, value in items:
+                self[key] = value
+            return
+        a = self.a
+        keys, values, hashes = self.keys, self.values, self.hashes
+        size, count = self.table_max_size, self.count
+        limit = self.load_factor * size
+        for key, value in items:
+            if count + 1 > limit or self.old_hashes is not None:
+                self.count = count
+                self[key] = value
+                keys, values, hashes = self.keys, self.values, self.hashes
+                size, count = self.table_max_size, self.count
+                limit = self.load_factor * size
+                continue
+
+            key_hash = polynomial_hash_value(key, a)
+            position = key_hash % size
+            slot_hash = hashes[position]
+            while slot_hash != EMPTY and (slot_hash != key_hash or keys[position] != key):
+                position = (position+1) % size
+                slot_hash = hashes[position]
+            if slot_hash == EMPTY:
+                keys[position] = key
+                hashes[position] = key_hash
+                count += 1
+            values[position] = value
+        self.count = count
+
+    # -----------------------------------------------------------------------
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    # -----------------------------------------------------------------------
+
+    def get_many(self, keys, default=None):
+        """
+        The value stored under each key (or default for those not in the table), probed in a single loop.
+        """
+        if self.old_hashes is not None or self.instrumentation is not None:
+            return [self.get(key, default) for key in keys]
+
+        a = self.a
+        slot_keys, values, hashes = self.keys, self.values, self.hashes
+        size = self.table_max_size
+        found = []
+        for key in keys:
+            key_hash = polynomial_hash_value(key, a)
+            position = key_hash % size
+            slot_hash = hashes[position]
+            while slot_hash != EMPTY and (slot_hash != key_hash or slot_keys[position] != key):
+                position = (position+1) % size
+                slot_hash = hashes[position]
+            found.append(default if slot_hash == EMPTY else values[position])
+        return found
+
+    # -----------------------------------------------------------------------
 
-        self.__rehash__()
-        self.__setitem__(key, value)
+    def contains_many(self, keys):
+        """
+        Whether each key is in the table, probed in a single loop.
+        """
+        if self.old_hashes is not None or self.instrumentation is not None:
+            return [key in self for key in keys]
+
+        a = self.a
+        slot_keys, hashes = self.keys, self.hashes
+        size = self.table_max_size
+        found = []
+        for key in keys:
+            key_hash = polynomial_hash_value(key, a)
+            position = key_hash % size
+            slot_hash = hashes[position]
+            while slot_hash != EMPTY and (slot_hash != key_hash or slot_keys[position] != key):
+                position = (position+1) % size
+                slot_hash = hashes[position]
+            found.append(slot_hash != EMPTY)
+        return found
+
+    # -----------------------------------------------------------------------
+
+    def __len__(self):
+        return self.count
+
+    # -----------------------------------------------------------------------
+
+    def enable_stats(self, sample_every=1000):
+        """
+        Start recording lookup probe lengths, inserts and resizes (discarding anything recorded before).
+        In incremental mode a resize's recorded duration covers only allocating the new arrays.
+        """
+        self.instrumentation = TableStats(sample_every)
+
+    # -----------------------------------------------------------------------
+
+    def disable_stats(self):
+        self.instrumentation = None
+
+    # -----------------------------------------------------------------------
+
+    def stats(self):
+        """
+        Size, load and longest cluster of the table, along with whatever has been recorded since enable_stats().
+        Mid-migration, the size and clusters are those of the new arrays.
+        """
+        instrumentation = self.instrumentation or TableStats()
+        return instrumentation.summary(self.count, self.table_max_size, (key_hash != EMPTY for key_hash in self.hashes))
+
+    # -----------------------------------------------------------------------
+
+    def record_lookup(self, key, key_hash, position):
+        """
+        Record the probe of the new arrays that ended at position, as a hit if key is in the table at all.
+        """
+        size = self.table_max_size
+        hit = self.hashes[position] != EMPTY or (self.old_hashes is not None and self.probe_old(key, key_hash) is not None)
+        self.instrumentation.record_probe((position - key_hash % size) % size, hit)
 
     # -----------------------------------------------------------------------
 
     def hash_value(self, input_string):
-        return ord(input_string[0]) % self.table_max_size
+        """
+        The full hash cached alongside a key. Its home slot in a table of any size is this modulo the size.
+        """
+        return polynomial_hash_value(input_string, self.a)
+
+    # -----------------------------------------------------------------------
+
+    def probe(self, key, key_hash):
+        """
+        Linear probe from the key's home slot to the slot holding it, or the empty slot ending its cluster.
+        """
+        hashes = self.hashes
+        size = self.table_max_size
+        position = key_hash % size
+        slot_hash = hashes[position]
+        while slot_hash != EMPTY:
+            if slot_hash == key_hash and self.keys[position] == key:
+                return position
+            position = (position+1) % size
+            slot_hash = hashes[position]
+        return position
+
+    # -----------------------------------------------------------------------
+
+    def probe_old(self, key, key_hash):
+        """
+        Linear probe the arrays being migrated out of, returning the slot holding key or None.
+        MIGRATED slots match no hash, so the probe carries on past them.
+        """
+        hashes = self.old_hashes
+        position = key_hash % self.old_size
+        slot_hash = hashes[position]
+        while slot_hash != EMPTY:
+            if slot_hash == key_hash and self.old_keys[position] == key:
+                return position
+            position = (position+1) % self.old_size
+            slot_hash = hashes[position]
+        return None
+
+    # -----------------------------------------------------------------------
+
+    def place(self, key, value, key_hash):
+        """
+        Store an item known not to be in the table yet, without touching count.
+        """
+        position = self.probe(key, key_hash)
+        self.keys[position] = key
+        self.values[position] = value
+        self.hashes[position] = key_hash
+
+    # -----------------------------------------------------------------------
+
+    def clear(self, position):
+        self.keys[position] = None
+        self.values[position] = None
+        self.hashes[position] = EMPTY
+
+    # -----------------------------------------------------------------------
+
+    def retire_old(self, position):
+        self.old_keys[position] = None
+        self.old_values[position] = None
+        self.old_hashes[position] = MIGRATED
+
+    # -----------------------------------------------------------------------
+
+    def migrate(self, steps=None):
+        """
+        Move the next `steps` slots (migrate_pace by default) of the old arrays into the new ones,
+        dropping the old arrays once they have all moved.
+        """
+        end = min(self.migrate_index + (steps or self.migrate_pace), self.old_size)
+        for index in range(self.migrate_index, end):
+            if self.old_hashes[index] >= 0:
+                self.place(self.old_keys[index], self.old_values[index], self.old_hashes[index])
+                self.retire_old(index)
+        self.migrate_index = end
+        if end == self.old_size:
+            self.old_keys = self.old_values = self.old_hashes = None
 
     # -----------------------------------------------------------------------
 
     def __rehash__(self):
-        temp = self.array
-        self.table_max_size = self.table_max_size * 2
-        self.array = build_array(self.table_max_size)
-        for item in temp:
-            if item is not None:
-                self.insert(item)
+        """
+        Grow to the next size in prime_list (or past its end, the next prime after double the size).
+        Every item is re-inserted straight away, or in incremental mode, over the following operations.
+        """
+        start = perf_counter()
+        if self.old_hashes is not None:
+            self.migrate(self.old_size)     # Only reachable if a migration can outlast its pace, which it can't
+        old_keys, old_values, old_hashes = self.keys, self.values, self.hashes
+        old_size = self.table_max_size
+        self.size_index += 1
+        if self.size_index < len(HashTableLinear.prime_list):
+            self.table_max_size = HashTableLinear.prime_list[self.size_index]
+        else:
+            self.table_max_size = next_prime(2 * self.table_max_size)
+        self.keys = build_slot_list(self.table_max_size)
+        self.values = build_slot_list(self.table_max_size)
+        self.hashes = build_hash_array(self.table_max_size)
+
+        if self.incremental:
+            self.old_keys, self.old_values, self.old_hashes = old_keys, old_values, old_hashes
+            self.old_size = old_size
+            self.migrate_index = 0
+            # Every insert migrates before checking the load factor, so there are at least `room` more migrations
+            # before the next rehash, counting the insert that triggers it
+            room = int(self.load_factor * self.table_max_size) - self.count
+            self.migrate_pace = max(self.migrate_step, ceil(old_size / max(room, 1)))
+        else:
+            for key, value, key_hash in zip(old_keys, old_values, old_hashes):
+                if key_hash != EMPTY:
+                    self.place(key, value, key_hash)
+        if self.instrumentation is not None:
+            self.instrumentation.record_resize(old_size, self.table_max_size, self.count, perf_counter() - start)
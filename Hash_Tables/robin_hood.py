@@ -0,0 +1,226 @@
+# Robin Hood Hashing
+
+
+from time import perf_counter
+
+from referential_array import build_array
+from hash_functions import polynomial_hash, next_prime, table_size_for
+from table_stats import TableStats
+
+
+class RobinHoodHashTable:
+    """
+    Linear probing where each slot also records its item's probe distance (how far it sits from its home slot).
+    An item being inserted takes the slot of any item closer to home than it is, and carries on inserting that one
+    instead, which keeps probe distances short and even. A lookup can stop as soon as it passes a slot whose item
+    is closer to home than the lookup has travelled, since the key would have displaced that item had it been there.
+    """
+
+    def __init__(self, table_size=11, load_factor=0.9, hash_function=polynomial_hash):
+        """
+        Args:
+            table_size (int): Initial number of slots.
+            load_factor (float): Grow the table once inserting would fill more than this fraction of it.
+                None keeps the table at a fixed size, refusing inserts once it is full.
+            hash_function: Called as hash_function(key, table_size) to find a key's home slot.
+        """
+        self.array = build_array(table_size)
+        self.distances = build_array(table_size)
+        self.table_max_size = table_size
+        self.count = 0
+        self.load_factor = load_factor
+        self.hash_function = hash_function
+        self.instrumentation = None     # A TableStats while enable_stats() is in effect
+
+    # -----------------------------------------------------------------------
+
+    def __str__(self):
+        string = ""
+        for index in range(self.table_max_size):
+            if self.array[index] is None:
+                pass
+            else:
+                string += str((index, str(self.array[index]), self.distances[index]))
+                string += ", "
+        return string
+
+    # -----------------------------------------------------------------------
+
+    def __getitem__(self, val):
+        item = self.probe(val)
+
+        if item is None:
+            raise KeyError(str(val)+" not found")
+        return item
+
+    # -----------------------------------------------------------------------
+
+    def __contains__(self, key):
+        return self.probe(key) is not None
+
+    # -----------------------------------------------------------------------
+
+    def __delitem__(self, val):
+        key = self.probe(val)
+
+        if key is None:
+            raise KeyError(str(val)+" not found")
+
+        # Backward shift: pull each following item of the cluster back a slot (one step closer to home),
+        # stopping at an empty slot or an item already in its home slot. No tombstones are needed
+        following = (key + 1) % self.table_max_size
+        while self.array[following] is not None and self.distances[following] > 0:
+            self.array[key] = self.array[following]
+            self.distances[key] = self.distances[following] - 1
+            key = following
+            following = (following + 1) % self.table_max_size
+        self.array[key] = None
+        self.distances[key] = None
+        self.count -= 1
+
+    # -----------------------------------------------------------------------
+
+    def insert(self, val):
+        if self.probe(val, False) is not None:
+            return True     # Already present
+        if self.load_factor is not None and self.count + 1 > self.load_factor * self.table_max_size:
+            self.__rehash__()
+        elif self.count == self.table_max_size:
+            return False
+
+        key = self.hash_value(val)
+        distance = 0
+        while self.array[key] is not None:
+            if self.distances[key] < distance:
+                # Take from the rich: this slot's item is closer to home, so it moves on instead
+                self.array[key], val = val, self.array[key]
+                self.distances[key], distance = distance, self.distances[key]
+            key = (key + 1) % self.table_max_size
+            distance += 1
+        self.array[key] = val
+        self.distances[key] = distance
+        self.count += 1
+        if self.instrumentation is not None:
+            self.instrumentation.record_insert(self.count, self.table_max_size)
+        return True
+
+    # -----------------------------------------------------------------------
+
+    def __rehash__(self, new_size=None):
+        """
+        Move every item into new arrays of new_size slots (by default the next prime after double the size).
+        """
+        instrumentation, self.instrumentation = self.instrumentation, None     # Moving items isn't inserting them
+        start = perf_counter()
+        old_array = self.array
+        old_size = self.table_max_size
+        self.table_max_size = new_size or next_prime(2 * self.table_max_size)
+        self.array = build_array(self.table_max_size)
+        self.distances = build_array(self.table_max_size)
+        self.count = 0
+        for item in old_array:
+            if item is not None:
+                self.insert(item)
+        self.instrumentation = instrumentation
+        if instrumentation is not None:
+            instrumentation.record_resize(old_size, self.table_max_size, self.count, perf_counter() - start)
+
+    # -----------------------------------------------------------------------
+
+    @classmethod
+    def from_iterable(cls, vals, expected_size=None, load_factor=0.9, hash_function=polynomial_hash):
+        """
+        Build a table holding every val, sized up front for expected_size of them (by default, however many vals
+        there are) so that loading them never has to grow it.
+        """
+        if expected_size is None:
+            vals = list(vals)
+            expected_size = len(vals)
+        table = cls(table_size_for(expected_size, load_factor), load_factor, hash_function)
+        for val in vals:
+            table.insert(val)
+        return table
+
+    # -----------------------------------------------------------------------
+
+    def get_many(self, vals):
+        """
+        The slot of each val (or None for those not in the table).
+        """
+        probe = self.probe
+        return [probe(val) for val in vals]
+
+    # -----------------------------------------------------------------------
+
+    def contains_many(self, vals):
+        return [slot is not None for slot in self.get_many(vals)]
+
+    # -----------------------------------------------------------------------
+
+    def __len__(self):
+        return self.count
+
+    # -----------------------------------------------------------------------
+
+    def enable_stats(self, sample_every=1000):
+        """
+        Start recording lookup probe lengths, inserts and resizes (discarding anything recorded before).
+        """
+        self.instrumentation = TableStats(sample_every)
+
+    # -----------------------------------------------------------------------
+
+    def disable_stats(self):
+        self.instrumentation = None
+
+    # -----------------------------------------------------------------------
+
+    def stats(self):
+        """
+        Size, load and longest cluster of the table, along with whatever has been recorded since enable_stats().
+        """
+        instrumentation = self.instrumentation or TableStats()
+        return instrumentation.summary(self.count, self.table_max_size, (item is not None for item in self.array))
+
+    # -----------------------------------------------------------------------
+
+    def hash_value(self, input_string):
+        return self.hash_function(input_string, self.table_max_size)
+
+    # -----------------------------------------------------------------------
+
+    def probe(self, val, find=True):
+        """
+        Slot holding val, or None. Stops early at the first slot whose item is closer to home than the probe has come.
+        find=False marks the check insert makes, which isn't recorded as a lookup.
+        """
+        key = self.hash_value(val)
+        distance = 0
+        while (self.array[key] is not None) and (self.distances[key] >= distance):
+            if self.array[key] == val:
+                if find and self.instrumentation is not None:
+                    self.instrumentation.record_probe(distance, True)
+                return key
+            key = (key + 1) % self.table_max_size
+            distance += 1
+        if find and self.instrumentation is not None:
+            self.instrumentation.record_probe(distance, False)
+        return None
+
+    # -----------------------------------------------------------------------
+
+
+if __name__ == "__main__":
+    input_strings = ["Eva", "Amy", "Tim", "Ron", "Jan", "Kim", "Dot", "Ann", "Jim", "Jon"]
+
+    muh_table = RobinHoodHashTable()
+
+    for string in input_strings:
+        muh_table.insert(string)
+
+    print(muh_table)
+    print()
+    print(muh_table['Jim'])
+    del muh_table['Jim']
+    print(muh_table)
+    print('Jim' in muh_table)
@@ -0,0 +1,105 @@
+# Optional Instrumentation Shared by the Hash Tables
+
+from collections import Counter
+
+
+def longest_cluster(occupied):
+    """
+    Length of the longest run of consecutive occupied slots, wrapping around the end of the table.
+    Args:
+        occupied: An iterable of booleans, one per slot in order, True where the slot is taken (tombstones included).
+    Returns:
+        The length of the longest run.
+    """
+    longest = 0
+    run = 0
+    leading = None  # Length of the run at the start of the table, which may continue from the end of it
+    for taken in occupied:
+        if taken:
+            run += 1
+            if run > longest:
+                longest = run
+        else:
+            if leading is None:
+                leading = run
+            run = 0
+    if leading is None:
+        return run
+    return max(longest, run + leading)
+
+
+def probe_summary(histogram):
+    total = sum(histogram.values())
+    if not total:
+        return 0, 0.0, 0
+    return total, sum(length * n for length, n in histogram.items()) / total, max(histogram)
+
+
+class TableStats:
+    """
+    What a hash table has done since its instrumentation was enabled. Tables only ever touch it from behind an
+    `if self.instrumentation is not None` check, so while disabled it costs one attribute test per operation.
+    """
+
+    def __init__(self, sample_every=1000):
+        """
+        Args:
+            sample_every (int): Record the load factor after every sample_every inserts (as well as around resizes).
+        """
+        self.hit_probes = Counter()     # Probe length -> number of lookups that found their key after that many steps
+        self.miss_probes = Counter()
+        self.inserts = 0
+        self.sample_every = sample_every
+        self.load_history = []          # (inserts so far, load factor)
+        self.resizes = []               # (old size, new size, seconds taken)
+
+    # -----------------------------------------------------------------------
+
+    def record_probe(self, length, hit):
+        if hit:
+            self.hit_probes[length] += 1
+        else:
+            self.miss_probes[length] += 1
+
+    # -----------------------------------------------------------------------
+
+    def record_insert(self, count, size):
+        self.inserts += 1
+        if self.inserts % self.sample_every == 0:
+            self.load_history.append((self.inserts, count / size))
+
+    # -----------------------------------------------------------------------
+
+    def record_resize(self, old_size, new_size, count, seconds):
+        self.resizes.append((old_size, new_size, seconds))
+        self.load_history.append((self.inserts, count / new_size))
+
+    # -----------------------------------------------------------------------
+
+    def summary(self, count, size, occupied):
+        """
+        The stats() dict of a table holding count items in size slots, whose slot occupancy is given by occupied.
+        """
+        hits, mean_hit, max_hit = probe_summary(self.hit_probes)
+        misses, mean_miss, max_miss = probe_summary(self.miss_probes)
+        resize_seconds = [seconds for _, _, seconds in self.resizes]
+        return {
+            "size": size,
+            "count": count,
+            "load_factor": count / size,
+            "longest_cluster": longest_cluster(occupied),
+            "hits": hits,
+            "hit_probes": Counter(self.hit_probes),
+            "mean_hit_probe": mean_hit,
+            "max_hit_probe": max_hit,
+            "misses": misses,
+            "miss_probes": Counter(self.miss_probes),
+            "mean_miss_probe": mean_miss,
+            "max_miss_probe": max_miss,
+            "inserts": self.inserts,
+            "load_history": list(self.load_history),
+            "resize_count": len(self.resizes),
+            "resize_seconds": sum(resize_seconds),
+            "max_resize_seconds": max(resize_seconds, default=0.0),
+            "resizes": list(self.resizes),
+        }
@@ -0,0 +1,56 @@
+# Tests for tombstone deletion and compaction in the open addressing hashTable classes
+
+from random import Random
+
+import pytest
+
+import double_hashing
+import linear_probing
+import quadratic_probing
+
+MODULES = [linear_probing, quadratic_probing, double_hashing]
+
+
+def check_slots(module, table, reference):
+    """The table holds exactly the reference set, with its count and tombstone tally matching its slots"""
+    slots = list(table.array)
+    assert sorted(item for item in slots if item is not None and item is not module.TOMBSTONE) == sorted(reference)
+    assert table.count == len(table) == len(reference)
+    assert table.tombstones == sum(item is module.TOMBSTONE for item in slots)
+
+
+@pytest.mark.parametrize("module", MODULES, ids=lambda module: module.__name__)
+def test_matches_set(module):
+    rand = Random(0)
+    table = module.hashTable()
+    reference = set()
+    for step in range(20_000):
+        key = "key-%d" % rand.randrange(300)
+        if rand.random() < 0.5:
+            assert table.insert(key)
+            reference.add(key)
+        elif key in reference:
+            del table[key]
+            reference.remove(key)
+        else:
+            with pytest.raises(KeyError):
+                del table[key]
+        assert (key in table) == (key in reference)
+        if step % 1_000 == 0:
+            check_slots(module, table, reference)
+    check_slots(module, table, reference)
+
+
+@pytest.mark.parametrize("module", MODULES, ids=lambda module: module.__name__)
+def test_churn_compacts_instead_of_growing(module):
+    table = module.hashTable()
+    live = []
+    for i in range(50_000):     # Every key is new, so each delete leaves a tombstone nothing will reuse
+        key = "key-%d" % i
+        table.insert(key)
+        live.append(key)
+        if len(live) > 20:
+            del table[live.pop(0)]
+        assert table.count + table.tombstones <= table.load_factor * table.table_max_size
+    check_slots(module, table, live)
+    assert table.table_max_size < 200
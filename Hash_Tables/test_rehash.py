@@ -0,0 +1,64 @@
+# Tests for HashTableLinear as a map, and its growth along prime_list
+
+from random import Random
+
+import pytest
+
+from hash_functions import next_prime
+from rehash import HashTableLinear
+
+SHORT_PRIMES = [11, 23, 47, 97]     # Stands in for prime_list, so a few hundred keys walk it and run past its end
+
+
+@pytest.fixture
+def short_primes(monkeypatch):
+    monkeypatch.setattr(HashTableLinear, "prime_list", SHORT_PRIMES)
+
+
+def test_matches_dict(short_primes):
+    rand = Random(0)
+    table = HashTableLinear()
+    reference = {}
+    for _ in range(20_000):
+        key = "key-%d" % rand.randrange(400)
+        operation = rand.random()
+        if operation < 0.5:
+            table[key] = reference[key] = rand.random()
+        elif operation < 0.7:
+            if key in reference:
+                del table[key]
+                del reference[key]
+            else:
+                with pytest.raises(KeyError):
+                    del table[key]
+        elif key in reference:
+            assert table[key] == reference[key]
+        else:
+            with pytest.raises(KeyError):
+                table[key]
+        assert (key in table) == (key in reference)
+        assert len(table) == len(reference)
+    assert all(table[key] == value for key, value in reference.items())
+
+
+@pytest.mark.parametrize("load_factor", [0.25, 0.5, 0.9])
+def test_grows_along_prime_list(short_primes, load_factor):
+    table = HashTableLinear(load_factor)
+    sizes = [table.table_max_size]
+    for i in range(300):
+        table["key-%d" % i] = i
+        assert len(table) <= load_factor * table.table_max_size
+        if table.table_max_size != sizes[-1]:
+            sizes.append(table.table_max_size)
+
+    expected = list(SHORT_PRIMES)
+    while load_factor * expected[-1] < 300:
+        expected.append(next_prime(2 * expected[-1]))
+    assert sizes == expected
+    assert all(table["key-%d" % i] == i for i in range(300))
+
+
+def test_rejects_full_load_factor():
+    for load_factor in (0, 1, 1.5):
+        with pytest.raises(ValueError):
+            HashTableLinear(load_factor)